@@ -0,0 +1,24 @@
+import time
+
+
+def best_time(call, runs, setup=None):
+    """
+    Time several runs of a call and keep the fastest, which is the one least disturbed by the rest of the machine.
+
+    :param call: the function to be timed; it takes no arguments, or the result of setup if setup is given
+    :param runs: the number of timed runs
+    :param setup: a function called, untimed, before each run to prepare the call's argument, or None
+    :return: a tuple of the best time in seconds and the result of the last run
+    """
+    best = float('inf')
+    result = None
+    for _ in range(runs):
+        if setup is None:
+            start = time.perf_counter()
+            result = call()
+        else:
+            prepared = setup()
+            start = time.perf_counter()
+            result = call(prepared)
+        best = min(best, time.perf_counter() - start)
+    return best, result
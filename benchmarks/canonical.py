@@ -0,0 +1,76 @@
+"""Measure the cost of stripping rank suffixes from spell names, with and without the canonical_spell_name cache.
+
+Every spell bullet of a synthetic cast corpus is canonicalized twice: once with the bare rank regex, as the reader
+did for every line before the cache, and once through gamparsecastreader.canonical_spell_name. The cache's hit and
+miss counts show how rarely the regex still runs.
+
+Run from the repository root:
+
+    python -m benchmarks.canonical [--players N] [--spells N] [--files N] [--runs N]
+"""
+
+import argparse
+import sys
+import tempfile
+
+import gamparsecastreader as gpc
+from benchmarks import best_time, corpus
+
+
+def read_raw_names(paths):
+    """
+    Collect the raw spell name of every spell bullet, rank suffix included, in file order.
+
+    :param paths: a list of paths to GamParse cast output
+    :return: a list of spell names
+    """
+    names = []
+    for path in paths:
+        with open(path) as input_handle:
+            for line in input_handle:
+                if line.startswith(gpc.GP_BULLET):
+                    names.append(line[len(gpc.GP_BULLET):].split(' - ')[0])
+    return names
+
+
+def strip_uncached(raw_name):
+    return sys.intern(gpc.RANK_SUFFIX.sub('', raw_name))
+
+
+def canonicalize_all(canonicalize, names):
+    for name in names:
+        canonicalize(name)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Benchmark spell name canonicalization.')
+    parser.add_argument('--players', type=int, default=200, help='players in the raid (default 200)')
+    parser.add_argument('--spells', type=int, default=150, help='distinct spells cast (default 150)')
+    parser.add_argument('--files', type=int, default=4, help='cast files (default 4)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default 0)')
+    parser.add_argument('--runs', type=int, default=5, help='timed runs; the best is kept (default 5)')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = corpus.write_corpus(directory, args.players, args.spells, args.files, 1, args.seed)
+        names = read_raw_names(paths['cast'])
+
+    uncached, _ = best_time(lambda: canonicalize_all(strip_uncached, names), args.runs)
+    # each timed run starts from an empty cache, so the misses of a cold run are included
+    cached, _ = best_time(lambda _: canonicalize_all(gpc.canonical_spell_name, names), args.runs,
+                          gpc.canonical_spell_name.cache_clear)
+    info = gpc.canonical_spell_name.cache_info()
+
+    if any(strip_uncached(name) != gpc.canonical_spell_name(name) for name in names):
+        print('FAIL: cached and uncached names differ')
+        return 1
+
+    print(f'{len(names):,} spell bullets, {len(set(names)):,} distinct raw names')
+    print(f'regex per line  {uncached * 1000:8.1f} ms  {len(names) / uncached:12,.0f} names/s')
+    print(f'cached          {cached * 1000:8.1f} ms  {len(names) / cached:12,.0f} names/s  ({uncached / cached:.1f}x)')
+    print(f'cache hits {info.hits:,}, misses {info.misses:,}, size {info.currsize:,} of {info.maxsize:,}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
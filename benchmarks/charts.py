@@ -0,0 +1,65 @@
+"""Compare the direct SVG chart writer against pygal, and against pygal and cairo where cairo is available.
+
+A stacked cast chart and a horizontal dps chart are generated from synthetic data, then written by svgchart, rendered
+to SVG by pygal, and rasterized to PNG by pygal and cairo.
+
+Run from the repository root:
+
+    python -m benchmarks.charts [--players N] [--spells N] [--runs N]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+import castgrapher as cg
+import svgchart
+from benchmarks import best_time
+
+
+def get_specs(directory, players, spells):
+    names = [f'Player{p}' for p in range(players)]
+    cast_series = [(f'Spell {s}', [(s * 7 + p * 3) % 40 for p in range(players)]) for s in range(spells)]
+    dps_series = [(name, [{'value': 20000 - 150 * p, 'label': f'{name}: {20000 - 150 * p}'}])
+                  for p, name in enumerate(names)]
+
+    def spec(kind, title, x_labels, series, style, options, name):
+        return cg.ChartSpec(kind, title, x_labels, series, style, options, os.path.join(directory, name))
+
+    return [
+        spec('stacked', 'Clerics: Heals', names, cast_series, cg.cast_style, cg.cast_options, 'heals'),
+        spec('horizontal', 'SDPS: All', None, dps_series, cg.dps_style, cg.dps_options, 'sdps'),
+    ]
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Compare chart rendering paths.')
+    parser.add_argument('--players', type=int, default=12, help='players per chart')
+    parser.add_argument('--spells', type=int, default=8, help='spells per stacked chart')
+    parser.add_argument('--runs', type=int, default=5, help='runs per path; the best time is reported')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        for spec in get_specs(directory, args.players, args.spells):
+            svg_spec = spec._replace(path=spec.path + '.svg')
+            png_spec = spec._replace(path=spec.path + '.png')
+
+            direct, _ = best_time(lambda: svgchart.write_chart(svg_spec), args.runs)
+            print(f'{spec.kind:10} svgchart      {direct * 1000:8.2f} ms')
+
+            pygal_svg, _ = best_time(lambda: cg.get_pygal_chart(svg_spec).render(), args.runs)
+            print(f'{spec.kind:10} pygal svg     {pygal_svg * 1000:8.2f} ms  ({pygal_svg / direct:.1f}x)')
+
+            try:
+                pygal_png, _ = best_time(lambda: cg.render_chart(png_spec), args.runs)
+            except (ImportError, OSError) as e:
+                print(f'{spec.kind:10} pygal png     skipped ({e.__class__.__name__}: cairo is unavailable)')
+            else:
+                print(f'{spec.kind:10} pygal png     {pygal_png * 1000:8.2f} ms  ({pygal_png / direct:.1f}x)')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,170 @@
+"""Generate synthetic GamParse cast and dps forum output, with a matching config.ini and blocklist.ini.
+
+Spell names come from everquestinfo where possible, so charts have something to show, and carry random rank
+suffixes as real parses do. A small share of casters are left out of the config to exercise the unrecognized player
+path. The same arguments and seed always produce the same corpus.
+
+Run from the repository root:
+
+    python -m benchmarks.corpus DIR [--players N] [--spells N] [--files N] [--fights N] [--seed N]
+"""
+
+import argparse
+import os
+import random
+import sys
+
+import everquestinfo as eq
+
+SYLLABLES = ['ae', 'bal', 'cor', 'dra', 'el', 'fen', 'gar', 'hal', 'is', 'jor', 'kal', 'lor', 'mir', 'nor', 'ok',
+             'pel', 'quin', 'ras', 'sil', 'tor', 'ul', 'vex', 'wyn', 'xan', 'yor', 'zed']
+RANKS = ['', '', ' Rk. II', ' Rk. III', ' II', ' III', ' IV', ' V']
+NOUNS = ['Aegis', 'Blast', 'Blessing', 'Remedy', 'Renewal', 'Strike', 'Torrent', 'Ward', 'Wrath', 'Zeal']
+MOBS = ['An enraged lemming', 'A sad lemming', 'Combined: The Queen of Lemmings', 'A lemming`s guardian',
+        'Lord Lemming, the Unyielding']
+BLOCKED = ['Illusion: ', 'Shadow of ']
+
+
+def make_roster(rng, n_players, unknown=0.02):
+    """
+    Invent players, their classes and aliases.
+
+    :param rng: a random.Random object
+    :param n_players: the number of players
+    :param unknown: the share of players left out of the config
+    :return: a list of (name, class, alias, in config) tuples
+    """
+    classes = sorted(eq.eq_classes)
+    roster = []
+    names = set()
+    while len(roster) < n_players:
+        name = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+        if name in names:
+            name += f'{len(roster)}'
+        names.add(name)
+        roster.append((name, rng.choice(classes), name[:rng.randint(3, 8)], rng.random() >= unknown))
+    return roster
+
+
+def make_spellbook(rng, n_spells):
+    """
+    Pick spell names, known spells first, then invented ones, plus a few blocked spells.
+
+    :param rng: a random.Random object
+    :param n_spells: the number of distinct spells
+    :return: a list of spell names without rank suffixes
+    """
+    known = sorted(set(eq.heals) | set(eq.utilities) | set(eq.nukes))
+    rng.shuffle(known)
+    spells = known[:n_spells]
+    names = set(spells)
+    while len(spells) < n_spells:
+        spell = f"{rng.choice(SYLLABLES).capitalize()}{rng.choice(SYLLABLES)}'s {rng.choice(NOUNS)}"
+        if spell in names:
+            spell += f' of {rng.choice(SYLLABLES).capitalize()}{len(spells)}'
+        names.add(spell)
+        spells.append(spell)
+    return spells + [prefix + 'Lemming' for prefix in BLOCKED]
+
+
+def iter_cast_parse(rng, roster, spellbook, date):
+    """
+    Generate the lines of one GamParse cast parse.
+
+    :return: a generator of lines
+    """
+    yield f'[B]Combined: {rng.choice(MOBS).replace("Combined: ", "")} on {date}[/B]'
+    yield ' '
+    for name, _, _, _ in roster:
+        casts = [(spell + rng.choice(RANKS), rng.randint(1, 300))
+                 for spell in rng.sample(spellbook, rng.randint(1, min(len(spellbook), 40)))]
+        yield f'[B]{name} - {sum(count for _, count in casts)}[/B]'
+        for spell, count in casts:
+            yield f'   --- {spell} - {count}'
+        yield ' '
+    yield '[B]Produced by GamParse v1.5.1.6[/B]'
+
+
+def iter_dps_parse(rng, roster, n_fights, date):
+    """
+    Generate the lines of one GamParse dps parse containing several fights.
+
+    :return: a generator of lines
+    """
+    for fight in range(n_fights):
+        fight_time = rng.randint(30, 900)
+        yield f'[B]{rng.choice(MOBS).replace("Combined: ", "")} on {date} in {fight_time}sec[/B]'
+        yield ' '
+
+        attackers = rng.sample(roster, rng.randint(1, len(roster)))
+        damage = [rng.randint(1000, 5000000) for _ in attackers]
+        for (name, _, _, _), total in sorted(zip(attackers, damage), key=lambda pair: -pair[1]):
+            active = rng.randint(1, fight_time)
+            yield f'[B]{name}[/B]'
+            yield (f' --- [B]DMG:[/B] {total} @ {total // fight_time} sdps ({total // active} dps in {active}s) '
+                   f'[{100 * total / sum(damage):.1f}%]')
+        yield '[B]Total[/B]'
+        yield f' --- [B]DMG:[/B] {sum(damage)} @ {sum(damage) // fight_time} sdps ' \
+              f'({sum(damage) // fight_time} dps in {fight_time}s) [100%]'
+        yield ' '
+
+
+def write_corpus(directory, n_players=200, n_spells=150, n_files=4, n_fights=20, seed=0):
+    """
+    Write a synthetic corpus.
+
+    :param directory: the output directory, which is created if necessary
+    :param n_players: the number of players in the raid
+    :param n_spells: the number of distinct spells cast
+    :param n_files: the number of cast parse files, and of dps parse files
+    :param n_fights: the number of fights in each dps parse file
+    :param seed: the random seed
+    :return: a dictionary with the keys 'cast' and 'dps', listing file paths, and 'config' and 'blocklist'
+    """
+    rng = random.Random(seed)
+    roster = make_roster(rng, n_players)
+    spellbook = make_spellbook(rng, n_spells)
+    os.makedirs(directory, exist_ok=True)
+
+    corpus = {
+        'cast': [os.path.join(directory, f'casts{i}.txt') for i in range(n_files)],
+        'dps': [os.path.join(directory, f'dps{i}.txt') for i in range(n_files)],
+        'config': os.path.join(directory, 'config.ini'),
+        'blocklist': os.path.join(directory, 'blocklist.ini')
+    }
+
+    for i, (cast_path, dps_path) in enumerate(zip(corpus['cast'], corpus['dps'])):
+        date = f'7/{i % 28 + 1}/2016'
+        # each file sees most, but not all, of the raid, as separate logs do
+        present = [player for player in roster if rng.random() < 0.9] or roster[:1]
+        _write_lines(cast_path, iter_cast_parse(rng, present, spellbook, date))
+        _write_lines(dps_path, iter_dps_parse(rng, present, n_fights, date))
+
+    _write_lines(corpus['config'], (f'{name},{eq_class},{alias}' for name, eq_class, alias, known in roster if known))
+    _write_lines(corpus['blocklist'], (prefix.strip() for prefix in BLOCKED))
+    return corpus
+
+
+def _write_lines(path, lines):
+    with open(path, 'w') as output_handle:
+        for line in lines:
+            output_handle.write(line)
+            output_handle.write('\n')
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Generate synthetic GamParse output.')
+    parser.add_argument('directory', help='output directory')
+    parser.add_argument('--players', type=int, default=200, help='players in the raid (default 200)')
+    parser.add_argument('--spells', type=int, default=150, help='distinct spells cast (default 150)')
+    parser.add_argument('--files', type=int, default=4, help='cast and dps files each (default 4)')
+    parser.add_argument('--fights', type=int, default=20, help='fights per dps file (default 20)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default 0)')
+    args = parser.parse_args(argv)
+
+    corpus = write_corpus(args.directory, args.players, args.spells, args.files, args.fights, args.seed)
+    print(f'Wrote {len(corpus["cast"])} cast and {len(corpus["dps"])} dps files to {args.directory}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,70 @@
+"""Time adding a synthetic corpus to a history database, and answering typical questions from it.
+
+Run from the repository root:
+
+    python -m benchmarks.history [--players N] [--spells N] [--files N] [--fights N] [--runs N]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import blocklist as bl
+import gamparsecastreader as gpc
+import gamparsedpsreader as gpd
+import history
+import playerdata
+from benchmarks import best_time, corpus
+
+
+def get_queries(player, spell, eq_class):
+    return [
+        (f"{player}'s {spell} casts over the last 12 raids",
+         lambda h: h.query_casts(['date'], player=player, spell=spell, last=12)),
+        (f'every {eq_class} spell, per player', lambda h: h.query_casts(['player', 'spell'], eq_class=eq_class)),
+        ('spells matching a glob, per date', lambda h: h.query_casts(['date', 'spell'], spell=spell[:3] + '*')),
+        (f"{player}'s dps per mob", lambda h: h.query_dps(['mob'], player=player)),
+        (f'{eq_class} dps over the last 12 raids', lambda h: h.query_dps(['player'], eq_class=eq_class, last=12)),
+        ('all dps, per class', lambda h: h.query_dps(['class'])),
+    ]
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Benchmark the history database.')
+    parser.add_argument('--players', type=int, default=200, help='players in the raid (default 200)')
+    parser.add_argument('--spells', type=int, default=150, help='distinct spells cast (default 150)')
+    parser.add_argument('--files', type=int, default=24, help='cast and dps files each (default 24)')
+    parser.add_argument('--fights', type=int, default=20, help='fights per dps file (default 20)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default 0)')
+    parser.add_argument('--runs', type=int, default=5, help='runs per query; the best time is reported (default 5)')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = corpus.write_corpus(directory, args.players, args.spells, args.files, args.fights, args.seed)
+        player_data = playerdata.PlayerData(paths['config'])
+        cast_reader = gpc.GPCastReader(player_data, bl.read_blocklist(paths['blocklist']))
+        dps_reader = gpd.GPDPSReader(player_data)
+
+        with history.History(os.path.join(directory, 'history.db')) as h:
+            start = time.perf_counter()
+            # the readers report unrecognized players, of which the corpus has a few
+            with contextlib.redirect_stdout(io.StringIO()):
+                casts = sum(h.add_cast_file(path, cast_reader) for path in paths['cast'])
+                damage = sum(h.add_dps_file(path, dps_reader) for path in paths['dps'])
+            seconds = time.perf_counter() - start
+            print(f'added {casts:,} cast and {damage:,} damage records from {2 * args.files} files in '
+                  f'{seconds:.2f} s')
+
+            player, eq_class, _ = player_data.rows[0]
+            spell = h.connection.execute('SELECT spell FROM casts WHERE player = ? LIMIT 1', (player,)).fetchone()[0]
+            for description, query in get_queries(player, spell, eq_class):
+                best, (_, rows) = best_time(lambda: query(h), args.runs)
+                print(f'{best * 1000:7.2f} ms {len(rows):6} rows  {description}')
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
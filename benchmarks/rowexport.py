@@ -0,0 +1,67 @@
+"""Compare Table.export_rows with a per-cell export of the same table on a large roster.
+
+Run from the repository root:
+
+    python -m benchmarks.rowexport [--players N] [--spells N] [--runs N]
+"""
+
+import argparse
+import random
+import sys
+
+import casttable
+from benchmarks import best_time
+
+
+class Roster:
+    """
+    A stand-in for PlayerData placing every player in the same class.
+    """
+
+    def __init__(self, names):
+        self.index = {name: ('CLR', name) for name in names}
+
+    def resolve(self, names, default=('unknown', 'unknown')):
+        return [self.index.get(name, default) for name in names]
+
+
+def make_cast_table(n_players, n_spells):
+    rng = random.Random(0)
+    names = [f'Player{i}' for i in range(n_players)]
+    spells = [f'Spell {i}' for i in range(n_spells)]
+    records = [dict({'name': name}, **{s: rng.randint(1, 500) for s in rng.sample(spells, n_spells // 4)})
+               for name in names]
+    return casttable.CastTable(records, Roster(names), [])
+
+
+def export_per_cell(table):
+    """
+    The row export as it was done before export_rows: one .loc lookup per row and one str call per cell.
+    """
+    row_names = list(table.index)
+    counts = []
+    for s in row_names:
+        counts.append([s] + [str(n) for n in list(table.loc[s])])
+    return [''] + table.columns.tolist(), counts
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Compare per-cell and bulk table row exports.')
+    parser.add_argument('--players', type=int, default=2000, help='players in the table (default 2000)')
+    parser.add_argument('--spells', type=int, default=400, help='distinct spells cast (default 400)')
+    parser.add_argument('--runs', type=int, default=3, help='runs per export; the best time is reported (default 3)')
+    args = parser.parse_args(argv)
+
+    cast_table = make_cast_table(args.players, args.spells)
+    table = cast_table._get_table('CLR')
+
+    per_cell, _ = best_time(lambda: export_per_cell(table), args.runs)
+    bulk, _ = best_time(lambda: cast_table.export_rows('CLR'), args.runs)
+    print(f'{args.players} players x {args.spells} spells')
+    print(f'per-cell export: {per_cell * 1000:9.1f} ms')
+    print(f'export_rows:     {bulk * 1000:9.1f} ms  ({per_cell / bulk:.1f}x)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,90 @@
+"""Compare a request to the local server against running eqparsetables.py afresh, and check concurrent requests.
+
+The server runs in this process on a free port. Each mode's tables are fetched serially, then all at once from many
+client threads; every concurrent response must match the serial one and the command line's output.
+
+Run from the repository root:
+
+    python -m benchmarks.server [--runs N] [--clients N]
+"""
+
+import argparse
+import concurrent.futures
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import urllib.request
+
+import blocklist as bl
+import playerdata
+import server
+from benchmarks import best_time, startup
+
+# request path and query, and the equivalent command line arguments
+MODES = [
+    ('/casts?format=tty', ['--tty', '--no-graphs', 'parse.txt'], 'parse.txt'),
+    ('/casts?format=enjin', ['--no-graphs', 'parse.txt'], 'parse.txt'),
+    ('/dps?format=tty&last=5', ['--tty', '--no-graphs', '--dps', '-l', '5', 'dps.txt'], 'dps.txt'),
+]
+
+
+def post(url, body):
+    with urllib.request.urlopen(urllib.request.Request(url, data=body, method='POST')) as response:
+        return response.read().decode('utf-8')
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Benchmark the local server against the command line.')
+    parser.add_argument('--runs', type=int, default=5, help='runs per mode; the best time is reported')
+    parser.add_argument('--clients', type=int, default=16, help='concurrent client threads')
+    args = parser.parse_args(argv)
+
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        startup.write_inputs(directory)
+        player_data = playerdata.PlayerData(os.path.join(directory, 'config.ini'))
+        blocklist = bl.read_blocklist(os.path.join(directory, 'blocklist.ini'))
+
+        httpd = server.make_server(('127.0.0.1', 0), player_data, blocklist)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{httpd.server_address[1]}'
+
+        try:
+            requests = []
+            for path, cli_args, input_name in MODES:
+                with open(os.path.join(directory, input_name), 'rb') as input_handle:
+                    body = input_handle.read()
+                url = base_url + path
+
+                expected = subprocess.run(startup.get_command(cli_args), cwd=directory, stdout=subprocess.PIPE,
+                                          universal_newlines=True, check=True).stdout
+                if post(url, body) != expected:
+                    failures.append(f'{path} differs from eqparsetables.py {" ".join(cli_args)}')
+
+                fresh, _ = best_time(lambda: subprocess.run(startup.get_command(cli_args), cwd=directory,
+                                                           stdout=subprocess.DEVNULL, check=True), args.runs)
+                warm, _ = best_time(lambda: post(url, body), args.runs)
+                print(f'{path:26} command {fresh * 1000:8.1f} ms   server {warm * 1000:6.1f} ms  '
+                      f'({fresh / warm:.0f}x)')
+
+                requests += [(url, body, expected)] * args.clients
+
+            with concurrent.futures.ThreadPoolExecutor(max_workers=args.clients) as clients:
+                responses = list(clients.map(lambda r: post(r[0], r[1]), requests))
+            mismatched = sum(response != expected for response, (_, _, expected) in zip(responses, requests))
+            print(f'{len(requests)} concurrent requests, {mismatched} mismatched')
+            if mismatched:
+                failures.append(f'{mismatched} concurrent responses differ from the serial ones')
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+
+    for failure in failures:
+        print(f'FAIL: {failure}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,238 @@
+"""Benchmark each stage of the pipeline on a synthetic corpus, recording throughput and peak memory.
+
+Every stage is timed on its own, with its inputs prepared beforehand, and is then run once more under tracemalloc to
+find its peak memory. Results can be saved as JSON and compared against a previous run, so that a regression in any
+one stage stands out.
+
+Run from the repository root:
+
+    python -m benchmarks.stages [--players N] [--spells N] [--files N] [--fights N] [--runs N]
+                                [--save PATH] [--compare PATH] [--tolerance PCT]
+"""
+
+import argparse
+import collections
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+
+import blocklist as bl
+import castgrapher as cg
+import casttable
+import dpstable
+import enjinformatter
+import gamparsecastreader as gpc
+import gamparsedpsreader as gpd
+import output
+import playerdata
+import svgchart
+import ttyformatter
+from benchmarks import best_time, corpus
+
+# a stage: its name, the unit its throughput is counted in, a setup function returning (inputs, units), and the
+# function being measured, which is called with the inputs
+Stage = collections.namedtuple('Stage', ['name', 'unit', 'setup', 'run'])
+
+
+def get_stages(data, chart_directory):
+    """
+    Describe the benchmarked stages.
+
+    :param data: a dictionary of the corpus, player data, and blocklist
+    :param chart_directory: a directory for rendered charts
+    :return: a list of Stage objects
+    """
+    player_data, blocklist = data['player_data'], data['blocklist']
+
+    def read_casts(paths):
+        reader = gpc.GPCastReader(player_data, blocklist)
+        return [reader.init_cast_data(path) for path in paths]
+
+    def read_dps(paths):
+        reader = gpd.GPDPSReader(player_data)
+        return [stats for path in paths for stats in reader.init_dps(path)]
+
+    def make_tables(table_type):
+        return [table_type(records, player_data, blocklist) for records in data['cast_records']]
+
+    def aggregate_sparse(tables):
+        accumulator = casttable.SparseCastAccumulator('max')
+        for table in tables:
+            accumulator.add(table)
+        return accumulator.get_table()
+
+    def export_classes(table):
+        return [table.get_rows(eq_class) for eq_class in sorted(table.get_classes())]
+
+    def write_class_tables(write_table):
+        def write(exported):
+            with open(os.devnull, 'w') as sink:
+                for eq_class, (header, body) in exported:
+                    write_table(sink, eq_class, [header], body)
+            return exported
+        return write
+
+    def write_outputs(exported):
+        specs = [output.OutputSpec(name, os.path.join(chart_directory, f'tables.{name}')) for name in output.formats]
+        with output.Outputs(specs) as outputs:
+            outputs.write(output.Table(eq_class, [header], body, False) for eq_class, (header, body) in exported)
+        return exported
+
+    def make_charts(table):
+        specs = [spec for eq_class in sorted(table.get_classes())
+                 for spec in cg.get_class_charts(*table.get_counts(eq_class), eq_class)]
+        for spec in specs:
+            svgchart.write_chart(spec._replace(path=os.path.join(chart_directory, os.path.basename(spec.path))))
+        return specs
+
+    def get_exported():
+        table = casttable.aggregate(make_tables(casttable.CastTable))
+        exported = [(eq_class, table.get_rows(eq_class)) for eq_class in sorted(table.get_classes())]
+        return exported, sum(len(body) for _, (_, body) in exported)
+
+    def get_aggregated():
+        table = casttable.aggregate(make_tables(casttable.CastTable))
+        return table, sum(len(table.get_counts(eq_class)[0]) for eq_class in table.get_classes())
+
+    def count_lines(paths):
+        return sum(1 for path in paths for _ in open(path))
+
+    return [
+        Stage('GPCastReader', 'lines', lambda: (data['cast_paths'], count_lines(data['cast_paths'])), read_casts),
+        Stage('GPDPSReader', 'lines', lambda: (data['dps_paths'], count_lines(data['dps_paths'])), read_dps),
+        Stage('CastTable', 'records', lambda: (casttable.CastTable, data['n_records']), make_tables),
+        Stage('SparseCastTable', 'records', lambda: (casttable.SparseCastTable, data['n_records']), make_tables),
+        Stage('aggregate', 'records', lambda: (make_tables(casttable.CastTable), data['n_records']),
+              casttable.aggregate),
+        Stage('SparseCastAccumulator', 'records',
+              lambda: (make_tables(casttable.SparseCastTable), data['n_records']), aggregate_sparse),
+        Stage('Table.get_rows', 'rows', lambda: (casttable.aggregate(make_tables(casttable.CastTable)), None),
+              export_classes),
+        Stage('DPSTable', 'records', lambda: (data['dps_records'], len(data['dps_records'])),
+              lambda records: dpstable.DPSTable(records, player_data).export_rows()),
+        Stage('enjinformatter', 'rows', get_exported, write_class_tables(enjinformatter.write_table)),
+        Stage('ttyformatter', 'rows', get_exported, write_class_tables(ttyformatter.write_table)),
+        Stage('output (all formats)', 'rows', get_exported, write_outputs),
+        Stage('castgrapher', 'rows', get_aggregated, make_charts),
+    ]
+
+
+def measure(stage, runs):
+    """
+    Time a stage and find its peak memory.
+
+    :param stage: a Stage object
+    :param runs: the number of timed runs; the best is kept
+    :return: a dictionary of the stage's results
+    """
+    # an untimed first run takes the cost of lazy imports and cold caches
+    inputs, units = stage.setup()
+    stage.run(inputs)
+
+    best, result = best_time(lambda prepared: stage.run(prepared[0]), runs, stage.setup)
+
+    if units is None:
+        units = sum(len(body) for _, body in result)
+
+    inputs, _ = stage.setup()
+    tracemalloc.start()
+    stage.run(inputs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {'seconds': best, 'units': units, 'unit': stage.unit, 'throughput': units / best, 'peak_bytes': peak}
+
+
+def load_data(directory, args):
+    paths = corpus.write_corpus(directory, args.players, args.spells, args.files, args.fights, args.seed)
+    player_data = playerdata.PlayerData(paths['config'])
+    blocklist = bl.read_blocklist(paths['blocklist'])
+
+    reader = gpc.GPCastReader(player_data, blocklist)
+    cast_records = [reader.init_cast_data(path) for path in paths['cast']]
+    dps_reader = gpd.GPDPSReader(player_data)
+    dps_records = [stats for path in paths['dps'] for stats in dps_reader.init_dps(path)]
+
+    return {
+        'cast_paths': paths['cast'],
+        'dps_paths': paths['dps'],
+        'player_data': player_data,
+        'blocklist': blocklist,
+        'cast_records': cast_records,
+        'dps_records': dps_records,
+        'n_records': sum(len(records) for records in cast_records)
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    List the stages which are slower, or use more memory, than in a baseline run.
+
+    :param results: the results of this run
+    :param baseline: the results of a previous run
+    :param tolerance: the allowed increase, as a fraction
+    :return: a list of descriptions of regressions
+    """
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        for key, label in (('seconds', 'time'), ('peak_bytes', 'peak memory')):
+            if result[key] > before[key] * (1 + tolerance):
+                regressions.append(f'{name} {label} rose {100 * (result[key] / before[key] - 1):.0f}%')
+    return regressions
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Benchmark each pipeline stage on a synthetic corpus.')
+    parser.add_argument('--players', type=int, default=200, help='players in the raid (default 200)')
+    parser.add_argument('--spells', type=int, default=150, help='distinct spells cast (default 150)')
+    parser.add_argument('--files', type=int, default=4, help='cast and dps files each (default 4)')
+    parser.add_argument('--fights', type=int, default=20, help='fights per dps file (default 20)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default 0)')
+    parser.add_argument('--runs', type=int, default=3, help='timed runs per stage; the best is kept (default 3)')
+    parser.add_argument('--save', help='write the results to a JSON file', metavar='PATH')
+    parser.add_argument('--compare', help='compare against results saved by an earlier run', metavar='PATH')
+    parser.add_argument('--tolerance', type=float, default=25, help='allowed regression in percent (default 25)')
+    args = parser.parse_args(argv)
+
+    results = dict()
+    with tempfile.TemporaryDirectory() as directory:
+        # the readers report unrecognized players, of which the corpus has a few
+        with contextlib.redirect_stdout(io.StringIO()):
+            data = load_data(directory, args)
+            stages = get_stages(data, directory)
+
+        print(f'{args.players} players, {args.spells} spells, {args.files} files, {args.fights} fights per file')
+        print(f'{"stage":22} {"time":>10} {"throughput":>22} {"peak memory":>12}')
+        for stage in stages:
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = measure(stage, args.runs)
+            results[stage.name] = result
+            print(f'{stage.name:22} {result["seconds"] * 1000:7.1f} ms {result["throughput"]:12,.0f} {stage.unit}/s'
+                  f'{"":{8 - len(stage.unit)}} {result["peak_bytes"] / 2 ** 20:8.1f} MB')
+
+    if args.save:
+        with open(args.save, 'w') as save_handle:
+            json.dump({'args': vars(args), 'stages': results}, save_handle, indent=2)
+
+    if args.compare:
+        with open(args.compare) as baseline_handle:
+            baseline = json.load(baseline_handle)
+        shape = ('players', 'spells', 'files', 'fights', 'seed')
+        if any(baseline['args'][key] != getattr(args, key) for key in shape):
+            print(f'Note: {args.compare} was measured on a different corpus')
+        regressions = compare(results, baseline['stages'], args.tolerance / 100)
+        for regression in regressions:
+            print(f'REGRESSION: {regression}')
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,120 @@
+"""Measure the start-up cost of common eqparsetables.py invocations and guard against regressions.
+
+Each mode is run as a fresh interpreter on a tiny input, so the timings are dominated by interpreter start-up and
+imports. The run fails if a mode imports a heavy dependency it does not need, or if a quick mode takes longer than
+its budget: a fixed allowance on top of the time a bare interpreter takes to import the packages that mode needs,
+so that the check holds on slow and fast machines alike.
+
+Run from the repository root:
+
+    python -m benchmarks.startup [--runs N] [--budget MS]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks import best_time
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'eqparsetables.py')
+
+CAST_PARSE = """[B]Combined: An enraged lemming on 7/26/2016[/B]
+
+[B]Healzalot - 149[/B]
+   --- Graceful Remedy Rk. II - 100
+   --- Word of Convalescence - 49
+
+[B]Produced by GamParse v1.5.1.6[/B]
+"""
+
+DPS_PARSE = """[B]An enraged lemming on 7/26/2016 in 120sec[/B]
+
+[B]Smashy[/B]
+ --- [B]DMG:[/B] 1200000 @ 10000 sdps (11000 dps in 109s) [50.5%]
+"""
+
+CONFIG = """Healzalot,CLR,Healz
+Smashy,WAR,Smash
+"""
+
+# mode name, command line arguments, modules the mode must not import, and the packages whose import time counts
+# towards the mode's budget, or None if the mode has no budget
+MODES = [
+    ('help', ['--help'], ['pandas', 'pygal', 'cairosvg'], ['numpy']),
+    ('sparse casts', ['--tty', '--sparse', '--no-graphs', 'parse.txt'], ['pandas', 'pygal', 'cairosvg'], ['numpy']),
+    ('tty casts', ['--tty', '--no-graphs', 'parse.txt'], ['pygal', 'cairosvg'], None),
+    ('tty dps', ['--tty', '--no-graphs', '--dps', 'dps.txt'], ['pygal', 'cairosvg'], None),
+    ('enjin casts', ['--no-graphs', 'parse.txt'], ['pygal', 'cairosvg'], None),
+]
+
+
+def write_inputs(directory):
+    for name, content in [('parse.txt', CAST_PARSE), ('dps.txt', DPS_PARSE), ('config.ini', CONFIG),
+                          ('blocklist.ini', 'Illusion:\n')]:
+        with open(os.path.join(directory, name), 'w') as handle:
+            handle.write(content)
+
+
+def get_command(args, import_time=False):
+    return [sys.executable] + (['-X', 'importtime'] if import_time else []) + [SCRIPT] + args
+
+
+def run(command, directory):
+    return subprocess.run(command, cwd=directory, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                          universal_newlines=True, check=True)
+
+
+def get_imported_packages(args, directory):
+    """
+    Collect the top-level packages imported by a run, from the interpreter's -X importtime report.
+    """
+    packages = set()
+    for line in run(get_command(args, import_time=True), directory).stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            packages.add(line.rsplit('|', 1)[1].strip().split('.')[0])
+    return packages
+
+
+def time_command(command, directory, runs):
+    return best_time(lambda: run(command, directory), runs)[0]
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Measure eqparsetables.py start-up time.')
+    parser.add_argument('--runs', type=int, default=5, help='runs per mode; the best time is reported')
+    parser.add_argument('--budget', type=float, default=150,
+                        help='time allowed for the quick modes beyond importing the packages they need, in ms '
+                             '(default 150)')
+    args = parser.parse_args(argv)
+
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        write_inputs(directory)
+
+        baseline = time_command([sys.executable, '-c', 'pass'], directory, args.runs)
+        print(f'{"interpreter":12} {baseline * 1000:8.1f} ms')
+
+        for name, mode_args, forbidden, needed in MODES:
+            elapsed = time_command(get_command(mode_args), directory, args.runs)
+            imported = sorted(get_imported_packages(mode_args, directory).intersection(forbidden))
+            budget = None
+            if needed is not None:
+                reference = [sys.executable, '-c', '; '.join(f'import {package}' for package in needed) or 'pass']
+                budget = time_command(reference, directory, args.runs) * 1000 + args.budget
+            print(f'{name:12} {elapsed * 1000:8.1f} ms' + (f'  (budget {budget:.0f} ms)' if budget else '') +
+                  (f'  imports {", ".join(imported)}' if imported else ''))
+
+            if imported:
+                failures.append(f'{name} imports {", ".join(imported)}')
+            if budget is not None and elapsed * 1000 > budget:
+                failures.append(f'{name} took {elapsed * 1000:.1f} ms, over its {budget:.0f} ms budget')
+
+    for failure in failures:
+        print(f'FAIL: {failure}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,59 @@
+import re
+
+
+class Blocklist:
+    """
+    A set of spell name prefixes compiled into a single anchored pattern.
+    """
+
+    def __init__(self, prefixes=()):
+        """
+        Construct a Blocklist object.
+
+        :param prefixes: an iterable of prefixes; any spell beginning with one of them is blocked
+        """
+        self.prefixes = sorted(set(p for p in prefixes if p))
+
+        if self.prefixes:
+            alternation = '|'.join(re.escape(p) for p in self.prefixes)
+            self.pattern = re.compile(f'(?:{alternation})')
+        else:
+            self.pattern = None
+
+    def __iter__(self):
+        return iter(self.prefixes)
+
+    def __len__(self):
+        return len(self.prefixes)
+
+    def is_blocked(self, spell):
+        """
+        Check whether a spell begins with any blocklisted prefix.
+
+        :param spell: the name of a spell
+        :return: True if the spell is blocked, False otherwise
+        """
+        return self.pattern is not None and self.pattern.match(spell) is not None
+
+
+def compile_prefixes(prefixes):
+    """
+    Compile a list of prefixes into a Blocklist, passing Blocklist objects through unchanged.
+
+    :param prefixes: a Blocklist object or an iterable of prefixes
+    :return: a Blocklist object
+    """
+    if isinstance(prefixes, Blocklist):
+        return prefixes
+    return Blocklist(prefixes)
+
+
+def read_blocklist(path):
+    """
+    Read a blocklist file containing one spell prefix per line.
+
+    :param path: path to the blocklist file
+    :return: a Blocklist object
+    """
+    with open(path, 'r') as bl_handle:
+        return Blocklist(row.strip() for row in bl_handle)
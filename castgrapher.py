@@ -1,10 +1,13 @@
-import operator as op
+import collections
+import hashlib
+import json
 import os
+import signal
 
-import pygal as pg
-import pygal.style as style
+import numpy as np
 
 import everquestinfo as eq
+import svgchart
 
 
 class SpellFilter:
@@ -23,6 +26,175 @@ class SpellFilter:
         self.spells = spells
 
 
+class RenderPool:
+    """
+    Render charts in worker processes so that rasterization overlaps with parsing and table formatting.
+
+    Processes are used rather than threads since cairo holds the GIL while rendering.
+    """
+
+    def __init__(self, jobs=None, chart_cache=None, chart_format='png'):
+        """
+        Construct a RenderPool object.
+
+        :param jobs: the number of worker processes, or None for one per CPU
+        :param chart_cache: a ChartCache used to skip charts that are already up to date, or None
+        :param chart_format: the file format of charts described for this pool, png or svg
+        """
+        self.jobs = jobs
+        self.executor = None
+        self.chart_cache = chart_cache
+        self.chart_format = chart_format
+        self.rendering = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.join()
+
+    def render(self, spec):
+        """
+        Queue a chart to be rendered, unless the chart cache shows that its PNG is already up to date.
+
+        :param spec: a ChartSpec object
+        """
+        if self.chart_cache is not None and self.chart_cache.is_current(spec):
+            return
+
+        if self.executor is None:
+            # workers are only started once a chart actually needs drawing
+            import concurrent.futures
+            self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.jobs,
+                                                                   initializer=_ignore_interrupts)
+        self.rendering.append((spec, self.executor.submit(render_chart, spec)))
+
+    def join(self):
+        """
+        Wait for every queued chart to be rendered, re-raising the first rendering error, if any.
+        """
+        try:
+            for _, future in self.rendering:
+                future.result()
+        finally:
+            if self.chart_cache is not None and self.rendering:
+                for spec, future in self.rendering:
+                    if future.done() and future.exception() is None:
+                        self.chart_cache.update(spec)
+                self.chart_cache.save()
+
+            self.rendering = []
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
+
+
+def _ignore_interrupts():
+    # Ctrl+C reaches the whole process group, but only the main process decides what an interrupt means
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+class ChartCache:
+    """
+    A manifest of the fingerprints of rendered charts, used to skip re-rendering charts whose content is unchanged.
+
+    A chart's fingerprint covers its title, labels, series, style, and options, so any change to what would be
+    drawn causes it to be rendered again.
+    """
+
+    def __init__(self, directory, manifest_name='.chart_manifest.json'):
+        """
+        Construct a ChartCache object, reading the manifest if one exists.
+
+        :param directory: the directory containing the rendered charts and the manifest
+        :param manifest_name: the file name of the manifest
+        """
+        self.path = os.path.join(directory, manifest_name)
+        try:
+            with open(self.path, 'r') as manifest_handle:
+                self.fingerprints = json.load(manifest_handle)
+        except (OSError, ValueError):
+            self.fingerprints = dict()
+
+    def is_current(self, spec):
+        """
+        Check whether a chart's PNG exists and was rendered from an identical chart.
+
+        :param spec: a ChartSpec object
+        :return: True if rendering can be skipped, False otherwise
+        """
+        return self.fingerprints.get(spec.path) == fingerprint(spec) and os.path.isfile(spec.path)
+
+    def update(self, spec):
+        self.fingerprints[spec.path] = fingerprint(spec)
+
+    def save(self):
+        with open(self.path, 'w') as manifest_handle:
+            json.dump(self.fingerprints, manifest_handle, indent=1, sort_keys=True)
+
+
+# the contents of a chart: its type, text, data, and look, plus where it is rendered to
+ChartSpec = collections.namedtuple('ChartSpec', ['kind', 'title', 'x_labels', 'series', 'style', 'options', 'path'])
+
+cast_style = {'font_family': 'DeJa Vu Sans', 'value_font_size': 8}
+cast_options = {'print_values': True, 'print_zeroes': False, 'show_minor_y_labels': True}
+dps_style = {'font_family': 'DeJa Vu Sans', 'label_font_size': 8}
+dps_options = {'show_legend': False, 'print_labels': True}
+
+
+def fingerprint(spec):
+    """
+    Summarize everything that determines how a chart looks as a short digest.
+
+    :param spec: a ChartSpec object
+    :return: a hex digest
+    """
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+
+
+def render_chart(spec):
+    """
+    Render a chart to PNG, or to SVG if its path ends in .svg.
+
+    SVG charts are written directly by svgchart, bypassing pygal and cairo altogether.
+
+    :param spec: a ChartSpec object
+    :return: void
+    """
+    if spec.path.endswith('.svg'):
+        svgchart.write_chart(spec)
+    else:
+        get_pygal_chart(spec).render_to_png(spec.path)
+
+
+def get_pygal_chart(spec):
+    """
+    Create a populated pygal chart.
+
+    :param spec: a ChartSpec object
+    :return: a pygal chart
+    """
+    # pygal, and cairo through it, are slow to import, so they are only loaded by processes that draw charts
+    import pygal as pg
+    import pygal.style as style
+
+    chart_types = {
+        'stacked': pg.StackedBar,
+        'horizontal': pg.HorizontalBar
+    }
+
+    chart = chart_types[spec.kind](style=style.DarkStyle(**spec.style), title=spec.title, **spec.options)
+    if spec.x_labels is not None:
+        chart.x_labels = spec.x_labels
+    if spec.kind == 'stacked':
+        chart.value_formatter = lambda x: f'{int(x)}'
+
+    for title, values in spec.series:
+        chart.add(title, values)
+
+    return chart
+
+
 def graph_heals(players, rows, eq_class, separate_spells=False):
     """
     Gather up heal spells and create healing graphs for each priest class.
@@ -71,54 +243,42 @@ def graph_nukes(players, rows, eq_class, separate_spells=False):
     return
 
 
-def get_unpopulated_chart(title, players):
+def graph_spells(players, rows, eq_class, spell_filter, separate_spells=False):
     """
-    Create a chart with a title and labeled axes.
+    Create bar graphs associating cast counts and spells to their respective casters.
 
-    :param title: the chart title
-    :param players: a list of players to appear on the x-axis
+    :param players: the players for whom data has been collected
+    :param rows: the name of each spell and the number of casts per player
+    :param eq_class: the class of players to be graphed (e.g., CLR)
+    :param spell_filter: a typical grouping of spells into heals, utility, or nukes
+    :param separate_spells: a flag indicating whether spells should be grouped by type or named individually
+    :return: void
     """
-    st = style.DarkStyle
-    st.font_family = "DeJa Vu Sans"
-    st.value_font_size = 8
-    chart = pg.StackedBar(style=st, print_values=True, print_zeroes=False)
-    chart.show_minor_y_labels = True
-    chart.title = title
-    chart.x_labels = players
-    chart.value_formatter = lambda x: f'{int(x)}'
-    return chart
+    render_chart(get_spell_chart(players, rows, eq_class, spell_filter, separate_spells))
 
 
-def graph_spells(players, rows, eq_class, spell_filter, separate_spells=False):
+def get_spell_chart(players, rows, eq_class, spell_filter, separate_spells=False, chart_format='png'):
     """
-    Create bar graphs associating cast counts and spells to their respective casters.
+    Describe a bar graph associating cast counts and spells to their respective casters.
 
     :param players: the players for whom data has been collected
     :param rows: the name of each spell and the number of casts per player
     :param eq_class: the class of players to be graphed (e.g., CLR)
     :param spell_filter: a typical grouping of spells into heals, utility, or nukes
     :param separate_spells: a flag indicating whether spells should be grouped by type or named individually
-    :return: void
+    :param chart_format: the file format of the chart, png or svg
+    :return: a ChartSpec object
     """
-    class_name = eq.get_class_name(eq_class)
-    title = '{0}: {1}'.format(class_name, spell_filter.name)
-    chart = get_unpopulated_chart(title, players[1:])
+    spells, counts = _split_rows(players, rows)
+    players = players[1:]
 
     if separate_spells:
-        spells = [row for row in rows if row[0] in spell_filter.spells.keys()]
-        for spell in spells:
-            chart.add(spell[0], spell[1:])
+        series = [(spell, spell_counts) for spell, spell_counts in zip(spells, counts.tolist())
+                  if spell in spell_filter.spells]
     else:
-        spell_types = dict()
-        for row in rows:
-            t = spell_filter.spells.get(row[0], '')
-            if t:
-                vs = [int(v) for v in row[1:]]
-                spell_types[t] = map(op.add, spell_types.get(t, [0] * len(vs)), vs)
-        for spell_type in sorted(spell_types.keys()):
-            chart.add(spell_type, list(spell_types[spell_type]))
+        series = SpellIndex([spell_filter]).get_type_series(spells, counts)[spell_filter.name]
 
-    chart.render_to_png(f'{os.getcwd()}/{class_name.lower()}_{spell_filter.name.lower()}.png')
+    return _make_spell_chart(players, eq_class, spell_filter.name, series, chart_format)
 
 
 def generate_class_graphs(players, rows, eq_class):
@@ -130,35 +290,128 @@ def generate_class_graphs(players, rows, eq_class):
     :param eq_class: the class of players to be graphed (e.g., CLR)
     :return: void
     """
-    dispatch = {
-        'CLR': [graph_heals, graph_utilities, graph_nukes],
-        'DRU': [graph_heals, graph_utilities, graph_nukes],
-        'SHM': [graph_heals, graph_utilities, graph_nukes]
-    }
+    spells, counts = _split_rows(players, rows)
+    for spec in get_class_charts(spells, players[1:], counts, eq_class):
+        render_chart(spec)
+
+
+def get_class_charts(spells, players, counts, eq_class, chart_format='png'):
+    """
+    Describe the spell cast graphs of a supported EQ class.
+
+    The series of every graph come from a single pass over the class's cast counts, using the class's SpellIndex.
 
-    for f in dispatch.get(eq_class, []):
-        f(players, rows, eq_class)
+    :param spells: the spell name of each row of 'counts'
+    :param players: the players for whom data has been collected, one per column of 'counts'
+    :param counts: a 2-D array of cast counts, as returned by CastTable.get_counts
+    :param eq_class: the class of players to be graphed (e.g., CLR)
+    :param chart_format: the file format of the charts, png or svg
+    :return: a list of ChartSpec objects, empty for classes that are not graphed
+    """
+    spell_index = class_spell_indexes.get(eq_class)
+    if spell_index is None:
+        return []
+
+    type_series = spell_index.get_type_series(spells, counts)
+    return [_make_spell_chart(players, eq_class, spell_filter.name, type_series[spell_filter.name], chart_format)
+            for spell_filter in spell_index.filters]
+
+
+def _split_rows(players, rows):
+    # the rows of get_rows: a gutter heading before the players, and each spell name before its counts
+    rows = np.asarray(rows, dtype=str).reshape(-1, len(players))
+    return rows[:, 0].tolist(), rows[:, 1:].astype(np.int64)
+
+
+def _make_spell_chart(players, eq_class, filter_name, series, chart_format):
+    class_name = eq.get_class_name(eq_class)
+    title = '{0}: {1}'.format(class_name, filter_name)
+    path = f'{os.getcwd()}/{class_name.lower()}_{filter_name.lower()}.{chart_format}'
+    return ChartSpec('stacked', title, [str(p) for p in players], series, cast_style, cast_options, path)
+
+
+class SpellIndex:
+    """
+    An index from spell name to the (filter, spell type) groups the spell is counted in, built once per filter list.
+
+    A spell may belong to several filters, e.g. a heal which also does damage, so each spell maps to a list of group
+    codes. Groups are numbered in filter order, then by spell type, which is the order their series are charted in.
+    """
+
+    def __init__(self, spell_filters):
+        """
+        Construct a SpellIndex object.
+
+        :param spell_filters: a list of SpellFilter objects
+        """
+        self.filters = spell_filters
+        self.groups = [(spell_filter.name, spell_type) for spell_filter in spell_filters
+                       for spell_type in sorted(set(spell_filter.spells.values())) if spell_type]
+
+        codes = {group: code for code, group in enumerate(self.groups)}
+        self.spell_groups = dict()
+        for spell_filter in spell_filters:
+            for spell, spell_type in spell_filter.spells.items():
+                if spell_type:
+                    self.spell_groups.setdefault(spell, []).append(codes[(spell_filter.name, spell_type)])
+
+    def get_type_series(self, spells, counts):
+        """
+        Total the cast counts of each spell type of every filter at once.
+
+        :param spells: the spell name of each row of 'counts'
+        :param counts: a 2-D array of cast counts, one row per spell and one column per player
+        :return: a dictionary mapping each filter name to a list of (spell type, [total per player]) pairs, covering
+                 the spell types which occur in 'spells'
+        """
+        spell_groups = self.spell_groups
+        pairs = np.array([(code, row) for row, spell in enumerate(spells) for code in spell_groups.get(spell, ())],
+                         dtype=np.intp).reshape(-1, 2)
+        codes, row_indices = pairs[:, 0], pairs[:, 1]
+
+        totals = np.zeros((len(self.groups), counts.shape[1]), dtype=np.int64)
+        np.add.at(totals, codes, counts[row_indices])
+
+        type_series = {spell_filter.name: [] for spell_filter in self.filters}
+        for code in np.unique(codes).tolist():
+            filter_name, spell_type = self.groups[code]
+            type_series[filter_name].append((spell_type, totals[code].tolist()))
+        return type_series
+
+
+# built once at import, since the spell maps never change while running
+priest_spell_index = SpellIndex([
+    SpellFilter('Heals', eq.heals),
+    SpellFilter('Utility', eq.utilities),
+    SpellFilter('Nukes', eq.nukes)
+])
+class_spell_indexes = {
+    'CLR': priest_spell_index,
+    'DRU': priest_spell_index,
+    'SHM': priest_spell_index
+}
 
 
 def graph_dps(rows, eq_class=None):
+    render_chart(get_dps_chart(rows, eq_class))
+
+
+def get_dps_chart(rows, eq_class=None, chart_format='png'):
+    """
+    Describe a horizontal bar graph of each player's sdps.
+
+    :param rows: a list of (player, sdps) pairs
+    :param eq_class: the class of players graphed (e.g., CLR), or None for all classes
+    :param chart_format: the file format of the chart, png or svg
+    :return: a ChartSpec object
+    """
     if eq_class is None:
         class_name = 'All'
     else:
         class_name = eq.get_class_name(eq_class)
 
     title = f'SDPS: {class_name}'
+    series = [(row[0], [{'value': row[1], 'label': f'{row[0]}: {row[1]}'}]) for row in rows]
 
-    st = style.DarkStyle
-    st.font_family = "DeJa Vu Sans"
-    st.label_font_size = 8
-    chart = pg.HorizontalBar(
-        style=st,
-        title=title,
-        show_legend=False,
-        print_labels=True,
-    )
-
-    for row in rows:
-        chart.add(row[0], [{'value': row[1], 'label': f'{row[0]}: {row[1]}'}])
-
-    chart.render_to_png(f'{os.getcwd()}/sdps_{class_name.lower()}.png')
+    path = f'{os.getcwd()}/sdps_{class_name.lower()}.{chart_format}'
+    return ChartSpec('horizontal', title, None, series, dps_style, dps_options, path)
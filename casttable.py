@@ -1,5 +1,8 @@
-import pandas as pd
+import array
 
+import numpy as np
+
+import blocklist as bl
 import table
 
 
@@ -16,8 +19,22 @@ class CastTable(table.Table):
         totals = t.sum()
         return list(totals)
 
-    def _get_table(self, eq_class=None):
-        t = super(CastTable, self)._get_table(eq_class) \
+    def get_counts(self, eq_class):
+        """
+        Get the cast counts of one class as numbers, e.g. for charting.
+
+        :param eq_class: the class of players to be included, or None for all players
+        :return: a tuple of the sorted spell names, the player aliases, and an int32 array of cast counts with one row
+                 per spell and one column per player
+        """
+        if not self.is_class_included(eq_class):
+            return [], [], np.zeros((0, 0), dtype=np.int32)
+
+        t = self._get_table(eq_class)
+        return list(t.index), list(t.columns), t.to_numpy()
+
+    def _make_table(self, table):
+        t = super(CastTable, self)._make_table(table) \
             .dropna(axis='columns', how='all') \
             .fillna(0) \
             .set_index('alias') \
@@ -31,13 +48,397 @@ class CastTable(table.Table):
         return self.blocklist
 
 
-def aggregate(cast_data_list):
-    t = cast_data_list[0]
+class MaxMerge:
+    """
+    Merge cast counts by keeping the highest count seen for each player and spell.
+    """
+
+    ufunc = np.maximum
+    averaged = False
+
+    def start(self, counts):
+        return _reduce_duplicates(counts, 'max')
+
+    def fold(self, state, counts):
+        state, counts = _align(state, self.start(counts))
+        return state.where(state.ge(counts) | counts.isna(), counts)
+
+    def finish(self, state):
+        return state
+
+
+class SumMerge:
+    """
+    Merge cast counts by adding up the counts of each player and spell.
+    """
+
+    ufunc = np.add
+    averaged = False
+
+    def start(self, counts):
+        return _reduce_duplicates(counts, 'sum')
+
+    def fold(self, state, counts):
+        state, counts = _align(state, self.start(counts))
+        return state.add(counts, fill_value=0)
+
+    def finish(self, state):
+        return state
+
+
+class MeanMerge:
+    """
+    Merge cast counts by averaging the counts of each player and spell over the parses in which they appear.
+    """
+
+    ufunc = np.add
+    averaged = True
+
+    def start(self, counts):
+        return _reduce_duplicates(counts, 'sum'), _reduce_duplicates(counts.notna().astype('int32'), 'sum')
+
+    def fold(self, state, counts):
+        totals, seen = state
+        new_totals, new_seen = self.start(counts)
+        totals, new_totals = _align(totals, new_totals)
+        seen, new_seen = _align(seen, new_seen)
+        return totals.add(new_totals, fill_value=0), seen.add(new_seen, fill_value=0)
+
+    def finish(self, state):
+        totals, seen = state
+        return (totals / seen).round()
+
+
+merge_strategies = {
+    'max': MaxMerge,
+    'sum': SumMerge,
+    'mean': MeanMerge
+}
+
+
+class CastAccumulator:
+    """
+    Fold CastTables into a single running CastTable, one table at a time.
+
+    Each table's counts are merged into the running result as soon as it is added, so memory stays proportional
+    to the merged table rather than to the number of tables added.
+    """
+
+    def __init__(self, strategy='max'):
+        """
+        Construct a CastAccumulator object.
+
+        :param strategy: the name of a merge strategy in merge_strategies, or a strategy object with start, fold,
+                         and finish methods
+        """
+        if isinstance(strategy, str):
+            strategy = merge_strategies[strategy]()
+        self.strategy = strategy
+
+        self.template = None
+        self.players = None
+        self.state = None
+
+    def add(self, cast_table):
+        """
+        Merge the counts of a CastTable into the running result.
+
+        :param cast_table: a CastTable object
+        """
+        import pandas as pd
+
+        data = cast_table.data
+        players = data[['name', 'class', 'alias']].drop_duplicates('name').set_index('name')
+        counts = data.drop(['class', 'alias'], axis='columns').set_index('name').apply(pd.to_numeric)
+
+        if self.template is None:
+            self.template = cast_table
+            self.players = players
+            self.state = self.strategy.start(counts)
+        else:
+            self.players = pd.concat([self.players, players[~players.index.isin(self.players.index)]])
+            self.state = self.strategy.fold(self.state, counts)
+
+    def get_table(self):
+        """
+        Retrieve the merged CastTable.
+
+        :return: a CastTable object containing the merged counts of every table added so far
+        """
+        counts = self.strategy.finish(self.state)
+        data = counts.join(self.players)
+        data.index.name = 'name'
+
+        self.template.data = data.reset_index()
+        return self.template
+
+
+class SparseCastTable:
+    """
+    Cast counts stored as sparse player x spell coordinates rather than a wide data frame.
+
+    Players and spells are integer coded, and only the casts that actually happened are stored, as parallel int32
+    arrays of player codes, spell codes, and counts. Dense per-class tables are only built on request, and only for
+    the players of that class. The public interface matches that of CastTable.
+    """
+
+    def __init__(self, event_data, player_data, blocklist):
+        """
+        Construct a SparseCastTable object.
+
+        :param event_data: a list of dictionaries with format {'name': caster, 'spell_1': count_1, ...}
+        :param player_data: a container of player information (name, class, alias)
+        :param blocklist: a Blocklist object or list of spell prefixes to be ignored
+        """
+        blocklist = bl.compile_prefixes(blocklist)
+
+        names = []
+        spells = dict()
+        player_codes = array.array('i')
+        spell_codes = array.array('i')
+        counts = array.array('i')
+        for stats in event_data:
+            player_code = len(names)
+            names.append(stats['name'])
+            for spell, count in stats.items():
+                if spell == 'name' or blocklist.is_blocked(spell):
+                    continue
+                player_codes.append(player_code)
+                spell_codes.append(spells.setdefault(spell, len(spells)))
+                counts.append(int(count))
+
+        self._set_coo(names, player_data.resolve(names, default=(None, None)), list(spells),
+                      player_codes, spell_codes, counts)
+
+    @classmethod
+    def from_coo(cls, names, classes_aliases, spells, player_codes, spell_codes, counts):
+        """
+        Construct a SparseCastTable object directly from coded cast counts.
+
+        :param names: a list of player names, indexed by player code
+        :param classes_aliases: a list of (class, alias) tuples, indexed by player code
+        :param spells: a list of spell names, indexed by spell code
+        :param player_codes: an int32 array of player codes
+        :param spell_codes: an int32 array of spell codes
+        :param counts: an int32 array of cast counts
+        :return: a SparseCastTable object
+        """
+        t = cls.__new__(cls)
+        t._set_coo(names, classes_aliases, spells, player_codes, spell_codes, counts)
+        return t
+
+    def _set_coo(self, names, classes_aliases, spells, player_codes, spell_codes, counts):
+        self.names = np.array(names, dtype=object)
+        self.classes = np.array([eq_class for eq_class, _ in classes_aliases], dtype=object)
+        self.aliases = np.array([alias for _, alias in classes_aliases], dtype=object)
+        self.spells = np.array(spells, dtype=object)
+        self.player_codes = np.asarray(player_codes, dtype=np.int32)
+        self.spell_codes = np.asarray(spell_codes, dtype=np.int32)
+        self.counts = np.asarray(counts, dtype=np.int32)
+        self._classes = None
+        self._views = dict()
+
+    def get_classes(self):
+        if self._classes is None:
+            classes = dict.fromkeys(self.classes.tolist())
+            self._classes = np.array([c for c in classes if c is not None], dtype=object)
+        return self._classes
+
+    def is_class_included(self, eq_class):
+        if eq_class is None:
+            return True
+
+        return eq_class in self.get_classes()
+
+    def get_players(self):
+        return list(self.aliases)
+
+    def get_totals(self, eq_class):
+        if not self.is_class_included(eq_class):
+            return []
+
+        _, _, counts = self._get_table(eq_class)
+        return list(counts.sum(axis=0))
+
+    def get_counts(self, eq_class):
+        """
+        Get the cast counts of one class as numbers, as CastTable.get_counts does.
+
+        :param eq_class: the class of players to be included, or None for all players
+        :return: a tuple of the sorted spell names, the player aliases, and an int32 array of cast counts
+        """
+        if not self.is_class_included(eq_class):
+            return [], [], np.zeros((0, 0), dtype=np.int32)
+
+        return self._get_table(eq_class)
+
+    def get_rows(self, eq_class=None):
+        if not self.is_class_included(eq_class):
+            return []
+
+        header, body = self.export_rows(eq_class)
+        return header.tolist(), body.tolist()
+
+    def export_rows(self, eq_class=None):
+        """
+        Export the table of one class as whole string arrays, as Table.export_rows does.
+
+        :param eq_class: the class of players to be included, or None for all players
+        :return: a tuple of the header, a 1-D string array starting with an empty gutter heading, and the body, a
+                 2-D string array whose first column holds the spell names
+        """
+        if not self.is_class_included(eq_class):
+            return np.array([''], dtype=str), np.empty((0, 1), dtype=str)
+
+        spells, aliases, counts = self._get_table(eq_class)
+        header = np.array([''] + aliases, dtype=str)
+        body = np.column_stack([np.array(spells, dtype=str).reshape(-1), table.to_strings(counts)])
+        return header, body
+
+    def _get_table(self, eq_class=None):
+        """
+        Retrieve the dense spells x players table of one class, building it on first use.
+
+        :param eq_class: the class of players to be included, or None for all players
+        :return: a tuple of the sorted spell names, the player aliases, and an int32 array of cast counts
+        """
+        if eq_class not in self._views:
+            self._views[eq_class] = self._make_table(eq_class)
+        return self._views[eq_class]
+
+    def _make_table(self, eq_class=None):
+        """
+        Build the dense spells x players table of one class.
+
+        :param eq_class: the class of players to be included, or None for all players
+        :return: a tuple of the sorted spell names, the player aliases, and an int32 array of cast counts
+        """
+        if eq_class is None:
+            players = np.arange(len(self.names))
+        else:
+            players = np.flatnonzero(self.classes == eq_class)
+
+        # map each player code to its column in the class table, or -1 for players of other classes
+        columns = np.full(len(self.names), -1, dtype=np.int64)
+        columns[players] = np.arange(len(players))
+        selected = columns[self.player_codes] >= 0
+
+        spell_codes = np.unique(self.spell_codes[selected])
+        spell_codes = spell_codes[np.argsort(self.spells[spell_codes], kind='stable')]
+        rows = np.full(len(self.spells), -1, dtype=np.int64)
+        rows[spell_codes] = np.arange(len(spell_codes))
+
+        counts = np.zeros((len(spell_codes), len(players)), dtype=np.int32)
+        np.add.at(counts, (rows[self.spell_codes[selected]], columns[self.player_codes[selected]]),
+                  self.counts[selected])
+        return list(self.spells[spell_codes]), list(self.aliases[players]), counts
+
+
+class SparseCastAccumulator:
+    """
+    Fold SparseCastTables into a single running SparseCastTable, one table at a time.
+
+    Players and spells are recoded into one shared code space and duplicate coordinates are reduced with the merge
+    strategy's ufunc, so memory stays proportional to the number of distinct casts in the merged table.
+    """
+
+    def __init__(self, strategy='max'):
+        """
+        Construct a SparseCastAccumulator object.
+
+        :param strategy: the name of a merge strategy in merge_strategies, or a strategy object with ufunc and
+                         averaged attributes
+        """
+        if isinstance(strategy, str):
+            strategy = merge_strategies[strategy]()
+        self.strategy = strategy
+
+        self.names = dict()
+        self.classes_aliases = []
+        self.spells = dict()
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.values = np.zeros(0, dtype=np.int64)
+        self.seen = np.zeros(0, dtype=np.int64)
+
+    def add(self, cast_table):
+        """
+        Merge the counts of a SparseCastTable into the running result.
+
+        :param cast_table: a SparseCastTable object
+        """
+        player_map = np.array([self._code(self.names, name, (eq_class, alias)) for name, eq_class, alias
+                               in zip(cast_table.names, cast_table.classes, cast_table.aliases)], dtype=np.int64)
+        spell_map = np.array([self._code(self.spells, spell) for spell in cast_table.spells], dtype=np.int64)
+
+        # spell codes are bounded by 2^31, so a player/spell pair fits in one int64 key
+        keys = (player_map[cast_table.player_codes] << 32) | spell_map[cast_table.spell_codes]
+        keys = np.concatenate([self.keys, keys])
+        values = np.concatenate([self.values, cast_table.counts.astype(np.int64)])
+        seen = np.concatenate([self.seen, np.ones(len(cast_table.counts), dtype=np.int64)])
+
+        self.keys, inverse = np.unique(keys, return_inverse=True)
+        self.values = np.zeros(len(self.keys), dtype=np.int64)
+        self.strategy.ufunc.at(self.values, inverse, values)
+        self.seen = np.zeros(len(self.keys), dtype=np.int64)
+        np.add.at(self.seen, inverse, seen)
+
+    def _code(self, codes, key, info=None):
+        code = codes.setdefault(key, len(codes))
+        if info is not None and code == len(self.classes_aliases):
+            self.classes_aliases.append(info)
+        return code
+
+    def get_table(self):
+        """
+        Retrieve the merged SparseCastTable.
+
+        :return: a SparseCastTable object containing the merged counts of every table added so far
+        """
+        values = self.values
+        if self.strategy.averaged:
+            values = np.round(values / self.seen)
+
+        return SparseCastTable.from_coo(list(self.names), self.classes_aliases, list(self.spells),
+                                        self.keys >> 32, self.keys & 0xffffffff, values)
+
+
+def aggregate(cast_data_list, strategy='max'):
+    """
+    Merge a list of CastTables into one.
+
+    :param cast_data_list: a list of CastTable objects
+    :param strategy: the name of a merge strategy in merge_strategies
+    :return: a CastTable object
+    """
+    accumulator = CastAccumulator(strategy)
+    for cd in cast_data_list:
+        accumulator.add(cd)
+    return accumulator.get_table()
+
+
+def _reduce_duplicates(counts, how):
+    """
+    Merge the rows of players who appear more than once in the same table.
+
+    :param counts: a data frame of cast counts indexed by player name
+    :param how: 'max' or 'sum'
+    :return: a data frame of cast counts with one row per player
+    """
+    if not counts.index.has_duplicates:
+        return counts
+
+    grouped = counts.groupby(level=0, sort=False)
+    if how == 'sum':
+        return grouped.sum(min_count=1)
+    return grouped.max()
+
 
-    if len(cast_data_list) > 1:
-        cast_tables = list()
-        for cd in cast_data_list:
-            cast_tables.append(cd.data)
-        t.data = pd.concat(cast_tables).groupby(level=0).max()
+def _align(left, right):
+    """
+    Conform two data frames of cast counts to the same players and spells, keeping first-seen order.
 
-    return t
+    :return: the reindexed left and right data frames
+    """
+    index = left.index.union(right.index, sort=False)
+    columns = left.columns.union(right.columns, sort=False)
+    return left.reindex(index=index, columns=columns), right.reindex(index=index, columns=columns)
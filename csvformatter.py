@@ -0,0 +1,23 @@
+import csv
+
+import format
+
+# written between tables: a blank line, which spreadsheets read as an empty row
+SEPARATOR = '\n'
+
+
+def write_table(sink, title, headers, rows):
+    """
+    Write a table as CSV to a file-like sink: a row holding the title, the header rows, then the body rows.
+
+    :param sink: a file-like object with a write method, e.g. sys.stdout
+    :param title: the table title
+    :param headers: a list of header rows
+    :param rows: a 2-D string array, or a list of lists, of rows
+    """
+    writer = csv.writer(sink, lineterminator='\n')
+    writer.writerow([title])
+    for chunk in format.iter_chunks(headers):
+        writer.writerows(chunk)
+    for chunk in format.iter_chunks(rows):
+        writer.writerows(chunk)
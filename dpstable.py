@@ -1,20 +1,190 @@
+import collections
+
+import numpy as np
+
 import table
 
+# the shown rows of one ranking: their positions in the table, their placements, and their percentile bands
+Ranking = collections.namedtuple('Ranking', ['positions', 'placements', 'bands'])
+
+# percentile band lower bounds, highest first, and their labels; rows below every bound are labelled 'bottom 50%'
+percentile_bands = [(90, 'top 10%'), (75, 'top 25%'), (50, 'top 50%')]
+
 
 class DPSTable(table.Table):
     def __init__(self, event_data, player_data):
         super(DPSTable, self).__init__(event_data, player_data)
 
+    def rank(self, first=0, last=10, by='total', by_class=False):
+        """
+        Rank players overall, and optionally within each class, selecting only the placements to be shown.
+
+        The classes are grouped with one stable sort, and each ranking uses partial selection, so the cost of a
+        ranking grows with the number of rows shown rather than with the size of the table. Equal values keep their
+        table order.
+
+        :param first: the index of the first placement to be shown
+        :param last: the index after the last placement to be shown
+        :param by: the column ranked on, highest first
+        :param by_class: a flag indicating whether each class should be ranked as well
+        :return: a dictionary mapping None, for the overall ranking, and each class, if requested, to a Ranking
+        """
+        import pandas as pd
+
+        values = pd.to_numeric(self.data[by]).to_numpy(dtype=np.int64)
+        groups = {None: np.arange(len(values))}
+        if by_class:
+            codes, classes = pd.factorize(self.data['class'], sort=True)
+            order = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[order], np.arange(len(classes) + 1))
+            for i, eq_class in enumerate(classes):
+                groups[eq_class] = order[bounds[i]:bounds[i + 1]]
+
+        rankings = dict()
+        for group, positions in groups.items():
+            group_values = values[positions]
+            top = _get_top(group_values, last)[first:]
+            rankings[group] = Ranking(positions[top], np.arange(first + 1, first + len(top) + 1),
+                                      _get_bands(group_values, group_values[top]))
+        return rankings
+
+    def export_ranking(self, ranking, bands=False):
+        """
+        Export the shown rows of a ranking as whole string arrays, as export_rows does for a whole table.
+
+        :param ranking: a Ranking returned by rank
+        :param bands: a flag indicating whether a column of percentile bands should be added
+        :return: a tuple of the header, a 1-D string array, and the body, a 2-D string array whose first column holds
+                 the placements
+        """
+        shown = super(DPSTable, self)._make_table(self.data.iloc[ranking.positions])
+        header = np.concatenate([[''], np.asarray(shown.columns, dtype=str)])
+        body = np.column_stack([ranking.placements.astype(str), shown.to_numpy().astype(str)])
+        if bands:
+            header = np.append(header, 'band')
+            body = np.column_stack([body, ranking.bands])
+        return header, body
+
+    def get_chart_rows(self, ranking):
+        """
+        Get the alias and sdps of the shown rows of a ranking, for castgrapher.get_dps_chart.
+
+        :param ranking: a Ranking returned by rank
+        :return: a list of (alias, sdps) pairs
+        """
+        import pandas as pd
+
+        shown = self.data.iloc[ranking.positions]
+        return list(zip(shown['alias'].tolist(), pd.to_numeric(shown['sdps']).astype(int).tolist()))
+
     def get_totals(self, eq_class):
         if not self.is_class_included(eq_class):
             return []
 
         return list(self.total)
 
-    def _get_table(self, eq_class=None):
-        t = super(DPSTable, self)._get_table(eq_class)
+    def _make_table(self, table):
+        t = super(DPSTable, self)._make_table(table)
         t.index = t.index + 1
         return t
 
     def _get_drop_columns(self):
         return ['pct', 'dps', 'time']
+
+
+class DPSAccumulator:
+    """
+    Sum the damage and time of each player across many fights and files, one file's fights at a time.
+
+    Only running sums per player are kept, so memory is bounded by the size of the roster however many fights are
+    added. SDPS and DPS are recomputed from the summed damage and times rather than combined from per-fight rates.
+    """
+
+    # the summed columns: total damage, active time, fight time, and number of fights
+    columns = 4
+
+    def __init__(self):
+        self.names = dict()
+        self.sums = np.zeros((0, self.columns), dtype=np.int64)
+
+    def add(self, fights):
+        """
+        Add the player stats of a batch of fights to the running sums.
+
+        :param fights: an iterable of (Fight, [stats, ...]) tuples, as produced by GPDPSReader.iter_fights
+        """
+        names = []
+        values = []
+        for fight, stats_list in fights:
+            for stats in stats_list:
+                names.append(stats['name'])
+                values.append((stats['total'], stats['time'], fight.time, 1))
+        if not names:
+            return
+
+        codes = np.array([self.names.setdefault(name, len(self.names)) for name in names], dtype=np.intp)
+        if len(self.names) > len(self.sums):
+            grown = np.zeros((len(self.names), self.columns), dtype=np.int64)
+            grown[:len(self.sums)] = self.sums
+            self.sums = grown
+
+        np.add.at(self.sums, codes, np.array(values, dtype=np.int64))
+
+    def get_table(self, player_data):
+        """
+        Retrieve the combined DPSTable, ranked by total damage.
+
+        :param player_data: a PlayerData object
+        :return: a DPSTable object with one row per player
+        """
+        total, active_time, fight_time, _ = self.sums.T
+        order = np.argsort(-total, kind='stable')
+        grand_total = total.sum()
+
+        dps = {
+            'name': np.array(list(self.names), dtype=object)[order],
+            'total': total[order],
+            'sdps': _per_second(total, fight_time)[order],
+            'dps': _per_second(total, active_time)[order],
+            'time': active_time[order],
+            'pct': np.round(100 * total / max(grand_total, 1), 1)[order]
+        }
+        return DPSTable(dps, player_data)
+
+
+def _per_second(damage, seconds):
+    return np.floor_divide(damage, seconds, out=np.zeros_like(damage), where=seconds > 0)
+
+
+def _get_top(values, k):
+    """
+    Find the positions of the k largest values, largest first, with equal values in position order.
+
+    :param values: a 1-D array
+    :param k: the number of positions wanted
+    :return: an array of at most k positions
+    """
+    if k <= 0:
+        return np.zeros(0, dtype=np.intp)
+    if k >= len(values):
+        return np.argsort(-values, kind='stable')
+
+    kth = np.partition(values, len(values) - k)[len(values) - k]
+    candidates = np.flatnonzero(values >= kth)
+    return candidates[np.argsort(-values[candidates], kind='stable')][:k]
+
+
+def _get_bands(values, shown):
+    """
+    Label shown values with the percentile band they fall in among all values.
+
+    :param values: every value of a ranking
+    :param shown: the shown values
+    :return: a string array of band labels
+    """
+    labels = np.array(['bottom 50%'] + [label for _, label in reversed(percentile_bands)])
+    if len(values) == 0:
+        return labels[:0]
+
+    bounds = np.percentile(values, [percentile for percentile, _ in reversed(percentile_bands)])
+    return labels[np.searchsorted(bounds, shown, side='right')]
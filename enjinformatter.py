@@ -1,3 +1,15 @@
+import io
+
+import numpy as np
+
+import format
+
+# written between tables: three blank lines
+SEPARATOR = '\n\n\n'
+# large numbers in dps tables are abbreviated, e.g. 1.2m
+HUMANIZE = True
+
+
 def make_table(title, headers, rows):
     """
     Convert a data frame into Enjin table format.
@@ -7,14 +19,26 @@ def make_table(title, headers, rows):
     :param rows:
     :return: a string containing parse data in Enjin table format
     """
-    str_list = []
-    str_list.append(f'[size=5][b]{title}[/b][/size]')
-    str_list.append('[table]')
-    str_list += [format_header(header) for header in headers]
-    str_list += [format_row(row) for row in rows]
-    str_list.append('[/table]')
+    table = io.StringIO()
+    write_table(table, title, headers, rows)
+    return table.getvalue()[:-1]
+
+
+def write_table(sink, title, headers, rows):
+    """
+    Write a table in Enjin table format to a file-like sink, a chunk of rows at a time.
 
-    return '\n'.join(str_list)
+    :param sink: a file-like object with a write method, e.g. sys.stdout
+    :param title: the table title
+    :param headers: a list of header rows
+    :param rows: a 2-D string array, or a list of lists, of rows
+    """
+    sink.write(f'[size=5][b]{title}[/b][/size]\n[table]\n')
+    for header in _to_lists(headers):
+        sink.write(format_header(header) + '\n')
+    for chunk in format.iter_chunks(rows):
+        sink.write(''.join(format_row(row) + '\n' for row in chunk))
+    sink.write('[/table]\n')
 
 
 def format_header(header_values):
@@ -43,4 +67,16 @@ def format_row(row_values):
     row = '[tr][td]{0}[/td][/tr]'
     row_sep = '[/td][td]'
 
-    return row.format(row_sep.join([gutter] + row_values[1:]))
+    return row.format(row_sep.join([gutter, *row_values[1:]]))
+
+
+def _to_lists(rows):
+    """
+    Convert a 2-D array of cells, as returned by Table.export_rows, into lists of strings in one pass.
+
+    :param rows: a 2-D array or a list of lists
+    :return: a list of lists
+    """
+    if isinstance(rows, np.ndarray):
+        return rows.tolist()
+    return [list(row) for row in rows]
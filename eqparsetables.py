@@ -2,17 +2,25 @@
 """Formats and filters GamParse spells and disc forum output."""
 
 import argparse
+import contextlib
 import os
 import sys
 
+import numpy as np
+
+import blocklist as bl
 import castgrapher as cg
 import casttable
-import enjinformatter
-import format
+import dpstable
+import everquestinfo as eq
+import parsecache
 import gamparsecastreader as gpc
 import gamparsedpsreader as gpd
+import output
+import parsepool
 import playerdata
-import ttyformatter
+import profiler
+import watcher
 
 __author__ = 'Andrew Quinn'
 __copyright__ = 'Copyright 2015-2016, Andrew Quinn'
@@ -30,10 +38,40 @@ def get_arg_parser():
     parser.add_argument('-b', '--blocklist', help='path to blocklist', metavar='PATH')
     parser.add_argument('-c', '--config', help='path to config CSV file', metavar='PATH')
     parser.add_argument('--dps', action='store_true', help='force dps formatting')
+    parser.add_argument('--fights', action='store_true', help='output one dps table per fight (no graphs)')
+    parser.add_argument('--no-graphs', action='store_true', help='do not render graphs')
+    parser.add_argument('--redraw', action='store_true', help='render graphs even if they are unchanged')
+    parser.add_argument('--chart-format', help='graph file format; svg skips pygal and cairo (default png)',
+                        choices=['png', 'svg'], default='png')
     parser.add_argument('--tty', action='store_true', help='output text (default is enjin post format)')
+    parser.add_argument('-o', '--out', action='append', type=output.parse_spec, metavar='FORMAT:PATH',
+                        help=f'write tables as one of {", ".join(sorted(output.formats))} to a file, or - for stdout; '
+                             f'may be repeated, and replaces the stdout output chosen by --tty')
     parser.add_argument('--attn', action='store_true', help='reconstruct attendance list')  # Work in progress...
     parser.add_argument('-f', '--dpsfirst', help='highest ranking dpser to show', metavar='FIRST')
     parser.add_argument('-l', '--dpslast', help='lowest ranking dpser to show', metavar='LAST')
+    parser.add_argument('--by-class', action='store_true', help='also rank dpsers within each class')
+    parser.add_argument('--bands', action='store_true', help='show the percentile band of each dpser')
+    parser.add_argument('-j', '--jobs', help='number of processes used to parse input files', metavar='N', type=int,
+                        default=1)
+    parser.add_argument('-m', '--merge', help='how cast counts from multiple parses are combined (default max)',
+                        choices=sorted(casttable.merge_strategies), default='max')
+    parser.add_argument('--sparse', action='store_true',
+                        help='store cast counts sparsely (large rosters, and needs no pandas)')
+    parser.add_argument('--cache', help='directory in which to cache parsed input files', metavar='DIR')
+    parser.add_argument('--cache-size', help='maximum parse cache size in MB (default 256)', metavar='MB',
+                        type=float, default=256)
+    parser.add_argument('--cache-age', help='days after which unused cache entries are evicted (default 90)',
+                        metavar='DAYS', type=float, default=90)
+    parser.add_argument('-w', '--watch', action='append', metavar='PATH',
+                        help='keep watching a file or directory of *.txt files, reprinting tables as parses arrive')
+    parser.add_argument('--interval', help='seconds between checks for new parses in watch mode (default 2)',
+                        metavar='SECONDS', type=float, default=2)
+    parser.add_argument('--profile', nargs='?', const='profile.json', metavar='PATH',
+                        help='write the time taken by each stage and the amount of data processed to a JSON report '
+                             '(default profile.json)')
+    parser.add_argument('--profile-memory', action='store_true',
+                        help='with --profile, also trace the peak memory of each stage (slow)')
 
     return parser
 
@@ -41,17 +79,50 @@ def get_arg_parser():
 def main(argv):
     parser = get_arg_parser()
     args = parser.parse_args()
-
-    paths = get_input_paths(args)
-    player_data = get_player_data(args)
-    make_table = get_table_maker(args)
-
-    if args.dps:
-        dps_first, dps_last = get_dps_bounds(args)
-        handle_dps(paths, player_data, dps_first, dps_last, make_table)
-    else:
-        blocked_spells = get_blocklist(args)
-        handle_casts(paths, player_data, blocked_spells, make_table)
+    if args.watch and args.dps:
+        parser.error('--watch only supports cast parses')
+    if args.watch and (args.paths or args.jobs != 1 or args.cache):
+        parser.error('--watch cannot be combined with PATHS, --jobs, or --cache')
+    files = [spec.path for spec in args.out or [] if spec.path != '-']
+    if len(files) != len(set(files)):
+        parser.error('each --out file may only be written once')
+
+    profile = profiler.Profiler(args.profile_memory) if args.profile else contextlib.nullcontext()
+    with profile:
+        paths = get_watch_paths(args) if args.watch else get_input_paths(args)
+        with profiler.stage('config'):
+            player_data = get_player_data(args)
+            blocked_spells = None if args.dps else get_blocklist(args)
+        cache = get_parse_cache(args)
+        graphs = get_render_pool(args)
+
+        with output.Outputs(get_output_specs(args)) as outputs:
+            try:
+                if args.dps:
+                    dps_first, dps_last = get_dps_bounds(args)
+                    if args.fights:
+                        handle_fights(paths, player_data, dps_first, dps_last, outputs, args.by_class, args.bands)
+                    else:
+                        handle_dps(paths, player_data, dps_first, dps_last, outputs, args.jobs, cache, graphs,
+                                   args.by_class, args.bands)
+                elif args.watch:
+                    watch_casts(paths, player_data, blocked_spells, outputs, args.merge, args.sparse,
+                                graphs, args.interval)
+                else:
+                    handle_casts(paths, player_data, blocked_spells, outputs, args.jobs, args.merge, cache,
+                                 args.sparse, graphs)
+            finally:
+                if graphs is not None:
+                    with profiler.stage('render'):
+                        graphs.join()
+
+    if cache is not None:
+        cache.evict()
+        print(cache.get_summary(), file=sys.stderr)
+
+    if args.profile:
+        profile.write_report(args.profile)
+        print(f'Profile written to {args.profile}', file=sys.stderr)
 
 
 def get_input_paths(args):
@@ -67,6 +138,14 @@ def get_input_paths(args):
     return paths
 
 
+def get_watch_paths(args):
+    for path in args.watch:
+        if not os.path.exists(path):
+            print(f'{path} does not exist. Exiting.')
+            sys.exit()
+    return args.watch
+
+
 def get_blocklist(args):
     blocklist_path = f'{os.getcwd()}/blocklist.ini'
     if args.blocklist:
@@ -75,12 +154,7 @@ def get_blocklist(args):
     else:
         check_default_file(blocklist_path)
 
-    blocklist = []
-    with open(blocklist_path, 'r') as bl_handle:
-        for row in bl_handle.read().splitlines():
-            blocklist.append(row.strip())
-
-    return blocklist
+    return bl.read_blocklist(blocklist_path)
 
 
 def get_player_data(args):
@@ -93,11 +167,34 @@ def get_player_data(args):
     return playerdata.PlayerData(config_path)
 
 
-def get_table_maker(args):
-    if args.tty:
-        return ttyformatter.make_table
-    else:
-        return enjinformatter.make_table
+def get_parse_cache(args):
+    if not args.cache:
+        return None
+
+    max_bytes = int(args.cache_size * 1024 * 1024)
+    max_age = args.cache_age * 24 * 60 * 60
+    return parsecache.ParseCache(args.cache, max_bytes, max_age)
+
+
+def get_render_pool(args):
+    # one table per fight is never graphed
+    if args.no_graphs or (args.dps and args.fights):
+        return None
+
+    chart_cache = None if args.redraw else cg.ChartCache(os.getcwd())
+    return cg.RenderPool(chart_cache=chart_cache, chart_format=args.chart_format)
+
+
+def get_output_specs(args):
+    """
+    Get the outputs requested with --out, or the single stdout output chosen by --tty.
+
+    :param args: parsed arguments
+    :return: a list of OutputSpec objects
+    """
+    if args.out:
+        return args.out
+    return [output.OutputSpec('tty' if args.tty else 'enjin', '-')]
 
 
 def get_dps_bounds(args):
@@ -135,47 +232,147 @@ def check_default_file(path):
             sys.exit()
 
 
-def handle_casts(paths, player_data, blocked, make_table):
+def handle_casts(paths, player_data, blocked, outputs, jobs=1, merge='max', cache=None, sparse=False,
+                 graphs=None):
     """
     Generate formatted spell cast output.
 
     :param paths: a list of paths to GamParse output
     :param player_data: a PlayerData object
     :param blocked: a Blocklist object of spells to be ignored
-    :param make_table: a function: f(eq_class, [[header strings...], ...], [[row strings], ...] -> string
+    :param outputs: an Outputs object the tables are written to
+    :param jobs: the number of processes used to parse input files
+    :param merge: the name of the strategy used to combine cast counts from multiple parses
+    :param cache: a ParseCache object used to skip parsing unchanged files, or None
+    :param sparse: a flag indicating whether cast counts should be stored in a SparseCastTable
+    :param graphs: a RenderPool used to render class graphs, or None for no graphs
     """
-    cast_table = get_cast_table(paths, player_data, blocked)
+    cast_table = get_cast_table(paths, player_data, blocked, jobs, merge, cache, sparse)
+    write_class_tables(cast_table, cast_table.get_classes(), outputs, graphs)
 
-    padding = '\n\n'
-    classes = cast_table.get_classes()
-    for i, eq_class in enumerate(sorted(classes)):
-        if i > 0:
-            print(padding)
 
-        totals = ['Total'] + [str(t) for t in cast_table.get_totals(eq_class)]
-        spells, rows = cast_table.get_rows(eq_class)
-        cg.generate_class_graphs(spells, rows, eq_class)
-        print(make_table(eq_class, [spells, totals], rows))
+def write_class_tables(cast_table, classes, outputs, graphs=None, shown=None):
+    """
+    Write, and optionally graph, the cast tables of some classes.
+
+    :param cast_table: a CastTable or SparseCastTable object
+    :param classes: the classes to be written
+    :param outputs: an Outputs object the tables are written to
+    :param graphs: a RenderPool used to render class graphs, or None for no graphs
+    :param shown: a dictionary of the rows last written per class, updated in place; classes whose rows are unchanged
+                  are skipped. None writes every class.
+    :return: the number of tables written
+    """
+    tables = []
+    for eq_class in sorted(classes):
+        with profiler.stage('export'):
+            totals = np.concatenate([['Total'], np.asarray(cast_table.get_totals(eq_class)).astype(str)])
+            spells, rows = cast_table.export_rows(eq_class)
+        if shown is not None:
+            previous = shown.get(eq_class)
+            if previous is not None and all(np.array_equal(a, b) for a, b in zip(previous, (spells, totals, rows))):
+                continue
+            shown[eq_class] = (spells, totals, rows)
+
+        profiler.count('players', len(spells) - 1)
+        profiler.count('spells', len(rows))
+        if graphs is not None:
+            with profiler.stage('charts'):
+                spell_names, aliases, counts = cast_table.get_counts(eq_class)
+                for spec in cg.get_class_charts(spell_names, aliases, counts, eq_class, graphs.chart_format):
+                    graphs.render(spec)
+        tables.append(output.Table(eq_class, [spells, totals], rows, False))
+
+    with profiler.stage('format'):
+        outputs.write(tables)
+    return len(tables)
+
+
+def watch_casts(paths, player_data, blocked, outputs, merge='max', sparse=False, graphs=None, interval=2.0):
+    """
+    Watch for new spell cast parses, folding each into the running tables and rewriting the classes it changes.
 
+    Content appended to a watched file is read as a parse of its own and merged like any other input file. The
+    charts of each batch are rendered before the next check, so rendering errors surface as they happen. Runs until
+    interrupted.
 
-def get_cast_table(paths, player_data, blocklist):
+    :param paths: a list of files and directories to watch
+    :param player_data: a PlayerData object
+    :param blocked: a Blocklist object of spells to be ignored
+    :param outputs: an Outputs object the tables are written to
+    :param merge: the name of the strategy used to combine cast counts from multiple parses
+    :param sparse: a flag indicating whether cast counts should be stored in a SparseCastTable
+    :param graphs: a RenderPool used to render class graphs, or None for no graphs
+    :param interval: the number of seconds between checks for new content
+    """
+    table_type, accumulator = get_cast_backend(merge, sparse)
+
+    reader = gpc.GPCastReader(player_data, blocked)
+    input_watcher = watcher.InputWatcher(paths)
+    shown = dict()
+
+    print(f'Watching {", ".join(paths)} for new parses. Press Ctrl+C to stop.', file=sys.stderr)
+    try:
+        for changes in input_watcher.watch(interval):
+            changed = set()
+            for path, text in changes:
+                spellcasts = list(reader.iter_cast_data(text.splitlines()))
+                if spellcasts:
+                    parse_table = table_type(spellcasts, player_data, blocked)
+                    changed.update(parse_table.get_classes())
+                    accumulator.add(parse_table)
+
+            if changed:
+                write_class_tables(accumulator.get_table(), changed, outputs, graphs, shown)
+                if graphs is not None:
+                    with profiler.stage('render'):
+                        graphs.join()
+    except KeyboardInterrupt:
+        pass
+
+
+def get_cast_backend(merge='max', sparse=False):
+    """
+    Choose the cast table type and the accumulator that merges its parses.
+
+    :param merge: the name of the strategy used to combine cast counts from multiple parses
+    :param sparse: a flag indicating whether cast counts should be stored in a SparseCastTable
+    :return: a tuple of the table type and an empty accumulator of that type
+    """
+    if sparse:
+        return casttable.SparseCastTable, casttable.SparseCastAccumulator(merge)
+    return casttable.CastTable, casttable.CastAccumulator(merge)
+
+
+def get_cast_table(paths, player_data, blocklist, jobs=1, merge='max', cache=None, sparse=False):
     """
     Create an aggregated CastTable from GamParse output file(s)
 
     :param paths: a list of paths to GamParse output
     :param player_data: a PlayerData object
-    :param blocklist: a list of spells to be ignored
-    :return: a CastTable object
+    :param blocklist: a Blocklist object of spells to be ignored
+    :param jobs: the number of processes used to parse input files
+    :param merge: the name of the strategy used to combine cast counts from multiple parses
+    :param cache: a ParseCache object used to skip parsing unchanged files, or None
+    :param sparse: a flag indicating whether cast counts should be stored in a SparseCastTable
+    :return: a CastTable or SparseCastTable object
     """
-    reader = gpc.GPCastReader(player_data)
+    table_type, accumulator = get_cast_backend(merge, sparse)
 
-    cast_tables = list()
-    for path in paths:
-        cast_tables.append(reader.get_cast_table(path, blocklist))
-    return casttable.aggregate(cast_tables)
+    for spellcasts in profiler.iter_stage('parse', parsepool.read_cast_files(paths, player_data, blocklist, jobs,
+                                                                             cache)):
+        profiler.count('records', len(spellcasts))
+        with profiler.stage('tables'):
+            cast_table = table_type(spellcasts, player_data, blocklist)
+        with profiler.stage('aggregate'):
+            accumulator.add(cast_table)
 
+    with profiler.stage('aggregate'):
+        return accumulator.get_table()
 
-def handle_dps(paths, player_data, dps_first, dps_last, make_table):
+
+def handle_dps(paths, player_data, dps_first, dps_last, outputs, jobs=1, cache=None, graphs=None,
+               by_class=False, bands=False):
     """
     Generate formatted dps output.
 
@@ -183,30 +380,108 @@ def handle_dps(paths, player_data, dps_first, dps_last, make_table):
     :param player_data: a PlayerData object
     :param dps_first: the index of the first player to be shown
     :param dps_last: the index of the last player to be shown
-    :param make_table: a function: f(eq_class, [[header strings...], ...], [[row strings], ...] -> string
+    :param outputs: an Outputs object the tables are written to
+    :param jobs: the number of processes used to parse input files
+    :param cache: a ParseCache object used to skip parsing unchanged files, or None
+    :param graphs: a RenderPool used to render the dps graphs, or None for no graphs
+    :param by_class: a flag indicating whether a table and graph should be made for each class as well
+    :param bands: a flag indicating whether the percentile band of each player should be shown
+    """
+    dps_table = get_dps_table(paths, player_data, jobs, cache)
+    write_dps_rankings('DPS', dps_table, dps_first, dps_last, outputs, by_class, bands, graphs)
+
+
+def write_dps_rankings(title, dps_table, dps_first, dps_last, outputs, by_class=False, bands=False, graphs=None):
+    """
+    Write, and optionally graph, the overall placements of a DPSTable, then those of each class if requested.
+
+    Every ranking comes from a single DPSTable.rank call, and only the shown rows are exported and formatted.
+
+    :param title: the title of the overall table
+    :param dps_table: a DPSTable object
+    :param dps_first: the index of the first player to be shown
+    :param dps_last: the index of the last player to be shown
+    :param outputs: an Outputs object the tables are written to
+    :param by_class: a flag indicating whether each class should be ranked as well
+    :param bands: a flag indicating whether the percentile band of each player should be shown
+    :param graphs: a RenderPool used to render the sdps graphs, or None for no graphs
     """
-    dps_table = get_dps_table(paths, player_data)
+    with profiler.stage('rank'):
+        rankings = dps_table.rank(dps_first, dps_last, by_class=by_class)
+
+    tables = []
+    for eq_class, ranking in sorted(rankings.items(), key=lambda item: item[0] or ''):
+        tables.append(get_ranking_table(title if eq_class is None else eq_class, dps_table, ranking, bands))
 
-    headers, rows = dps_table.get_rows()
-    if dps_last > len(rows):
-        dps_last = len(rows)
+        if graphs is not None and (eq_class is None or eq_class in eq.eq_classes):
+            with profiler.stage('charts'):
+                chart_rows = dps_table.get_chart_rows(ranking)
+                graphs.render(cg.get_dps_chart(chart_rows, eq_class, chart_format=graphs.chart_format))
 
-    formatted_rows = [[format.humanize(cell) for cell in row] for row in rows]
-    print(make_table("DPS", [headers], formatted_rows[dps_first:dps_last]))
-    players = dps_table.get_players()
-    chart_rows = [[row[1], int(row[3])] for row in rows]
-    cg.graph_dps(chart_rows[dps_first:dps_last])
+    with profiler.stage('format'):
+        outputs.write(tables)
 
 
-def get_dps_table(paths, player_data):
-    if len(paths) > 1:
-        print(f'Combining DPS parses is not currently supported. '
-              f'Ignoring input files {", ".join(paths[1:])}...')
+def handle_fights(paths, player_data, dps_first, dps_last, outputs, by_class=False, bands=False):
+    """
+    Generate formatted dps output with one table per fight, reading each fight lazily.
 
-    path = paths[0]
+    :param paths: a list of paths to GamParse output
+    :param player_data: a PlayerData object
+    :param dps_first: the index of the first player to be shown
+    :param dps_last: the index of the last player to be shown
+    :param outputs: an Outputs object the tables are written to
+    :param by_class: a flag indicating whether each fight's classes should be ranked as well
+    :param bands: a flag indicating whether the percentile band of each player should be shown
+    """
     reader = gpd.GPDPSReader(player_data)
-    dps_table = reader.get_dps_table(path)
-    return dps_table
+    for path in paths:
+        for fight, dps_table in profiler.iter_stage('parse', reader.iter_dps_tables(path)):
+            title = f'{fight.mob} on {fight.date} in {fight.time}sec'
+            write_dps_rankings(title, dps_table, dps_first, dps_last, outputs, by_class, bands)
+
+    profiler.count('input_lines', reader.lines_read)
+    profiler.count('input_bytes', reader.bytes_read)
+
+
+def get_ranking_table(title, dps_table, ranking, bands=False):
+    """
+    Export the shown placements of one ranking of a DPSTable.
+
+    :param title: the table title
+    :param dps_table: a DPSTable object
+    :param ranking: a Ranking returned by DPSTable.rank
+    :param bands: a flag indicating whether the percentile band of each player should be shown
+    :return: a Table object
+    """
+    with profiler.stage('export'):
+        headers, rows = dps_table.export_ranking(ranking, bands)
+    profiler.count('players', len(rows))
+    return output.Table(title, [headers], rows, True)
+
+
+def get_dps_table(paths, player_data, jobs=1, cache=None):
+    """
+    Create a DPSTable from GamParse output file(s).
+
+    Every fight of every file is combined, one file at a time, into one row per player, ranked by total damage, so
+    the table does not depend on how the fights are split across files.
+
+    :param paths: a list of paths to GamParse output
+    :param player_data: a PlayerData object
+    :param jobs: the number of processes used to parse input files
+    :param cache: a ParseCache object used to skip parsing unchanged files, or None
+    :return: a DPSTable object
+    """
+    files = profiler.iter_stage('parse', parsepool.read_dps_files(paths, player_data, jobs, cache))
+    accumulator = dpstable.DPSAccumulator()
+    for fights in files:
+        profiler.count('records', sum(len(stats_list) for _, stats_list in fights))
+        with profiler.stage('aggregate'):
+            accumulator.add(fights)
+
+    with profiler.stage('tables'):
+        return accumulator.get_table(player_data)
 
 
 if __name__ == '__main__':
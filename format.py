@@ -1,6 +1,11 @@
-def humanize(s):
-    suffix = ['', 'k', 'm', 'bn', 'tn']
+import numpy as np
+
+SUFFIXES = ['', 'k', 'm', 'bn', 'tn']
+# the number of rows the formatters convert and write at a time
+CHUNK_ROWS = 1024
 
+
+def humanize(s):
     try:
         n = float(s)
     except ValueError:
@@ -14,4 +19,54 @@ def humanize(s):
         n /= 1000.0
         mag += 1
 
-    return f'{n:.1f}{suffix[mag]}'
+    return f'{n:.1f}{SUFFIXES[mag]}'
+
+
+def humanize_array(values):
+    """
+    Humanize a whole array of numbers or numeric strings at once, giving the same strings as humanize gives for
+    each value.
+
+    :param values: an array, or a list, of numbers or strings
+    :return: a string array of the same shape
+    """
+    strings = np.asarray(values).astype(str)
+    try:
+        n = strings.astype(float)
+    except ValueError:
+        # some values are not numbers, and are left as they are by humanize
+        return np.vectorize(humanize, otypes=[str])(strings).reshape(strings.shape)
+
+    large = ~(n < 1000)
+    if not large.any():
+        return strings
+
+    scaled = n[large]
+    mag = np.zeros(scaled.shape, dtype=int)
+    for _ in SUFFIXES[1:]:
+        over = scaled > 1000
+        if not over.any():
+            break
+        scaled[over] /= 1000.0
+        mag[over] += 1
+
+    humanized = np.char.add(np.char.mod('%.1f', scaled), np.asarray(SUFFIXES)[mag])
+    result = strings.astype(np.result_type(strings.dtype, humanized.dtype))
+    result[large] = humanized
+    return result
+
+
+def iter_chunks(rows, size=CHUNK_ROWS):
+    """
+    Split rows into lists of at most 'size' rows, each a list of cells, converting arrays one chunk at a time.
+
+    :param rows: a 2-D array or a list of lists
+    :param size: the number of rows per chunk
+    :return: a generator of lists of rows
+    """
+    for start in range(0, len(rows), size):
+        chunk = rows[start:start + size]
+        if isinstance(chunk, np.ndarray):
+            yield chunk.tolist()
+        else:
+            yield [row.tolist() if isinstance(row, np.ndarray) else list(row) for row in chunk]
@@ -1,6 +1,33 @@
+import functools
+import os
 import re
+import sys
 
-import casttable
+import blocklist as bl
+
+# bump whenever a change to the reader alters the records it produces, invalidating cached parses
+READER_VERSION = 2
+
+# words are matched without nested repetition, so a non-matching line fails in linear rather than exponential time
+MOB_ON_DATE = r'(?P<mob>(?:Combined: )?[\w`,]+(?: [\w`,]+)* ?) on (?P<date>\d{1,2}/\d{1,2}/\d{2,4})'
+GP_HEADER = re.compile(MOB_ON_DATE)
+NAME_GRABBER = re.compile(r'\[B\](?P<name>\w+) - \d+\[/B\]')
+GP_BULLET = '   --- '
+RANK_SUFFIX = re.compile(r' (?:Rk\. )?(?:X{0,3})(?:IX|IV|V?I{0,3})$')
+
+
+@functools.lru_cache(maxsize=4096)
+def canonical_spell_name(raw_name):
+    """
+    Strip the rank suffix from a spell name, e.g. 'Graceful Remedy Rk. II' -> 'Graceful Remedy'.
+
+    Results are memoized and interned, so the rank regex runs once per distinct spell name across all readers and
+    files, and every record shares a single copy of each canonical name.
+
+    :param raw_name: a spell name as it appears in GamParse output
+    :return: the spell name without its rank
+    """
+    return sys.intern(RANK_SUFFIX.sub('', raw_name))
 
 
 class GPCastReader:
@@ -8,7 +35,7 @@ class GPCastReader:
     Read and store GamParse caster output information
     """
 
-    def __init__(self, player_data):
+    def __init__(self, player_data, blocklist=()):
         """
         Create a GPCastReader object.
 
@@ -18,9 +45,12 @@ class GPCastReader:
         self.mob = ''
         self.date = ''
 
-        self.player_data = player_data
+        # the amount of input read so far, for profiling
+        self.lines_read = 0
+        self.bytes_read = 0
 
-        self.rk = re.compile(r' (?:Rk\. )?(?:X{0,3})(?:IX|IV|V?I{0,3})$')
+        self.player_data = player_data
+        self.blocklist = bl.compile_prefixes(blocklist)
 
     def read_entry_header(self, gp_header, name_grabber, line):
         """
@@ -45,61 +75,73 @@ class GPCastReader:
                 player = 'unknown'
         return player
 
-    def get_caster_stats(self, caster, lines):
-        gp_bullet = '   --- '
-
-        stats = {'name': caster}
-        for line in lines:
-            if line.startswith(gp_bullet):
-                scc = line[len(gp_bullet):].split(" - ")
-                spell = self.rk.sub('', scc[0])
-                if spell in stats:
-                    print((f'Spell {spell} already exists for {caster} with cast count {stats[spell]}... '
-                           f'incrementing by {scc[1]}'))
-                    stats[spell] = str(int(stats[spell]) + int(scc[1]))
-                else:
-                    stats.update({spell: scc[1]})
-            else:
-                return stats
+    def add_spell_cast(self, stats, line):
+        """
+        Add the cast count on a spell bullet line to a caster's stats.
 
-    def init_cast_data(self, input_path):
+        :param stats: the stats dictionary of the current caster
+        :param line: line of the cast output file to be parsed
+        :return: True if the line was a spell bullet, False otherwise
         """
-        Extract caster names and spellcast info from GamParse forum output.
+        if not line.startswith(GP_BULLET):
+            return False
+
+        scc = line[len(GP_BULLET):].split(" - ")
+        spell = canonical_spell_name(scc[0])
+        if self.blocklist.is_blocked(spell):
+            return True
+
+        count = int(scc[1])
+        caster = stats['name']
+        if spell in stats:
+            print((f'Spell {spell} already exists for {caster} with cast count {stats[spell]}... '
+                   f'incrementing by {count}'))
+            stats[spell] += count
+        else:
+            stats[spell] = count
+        return True
+
+    def iter_cast_data(self, input_handle):
+        """
+        Lazily extract caster names and spellcast info from GamParse forum output.
+
+        The input is consumed in a single pass, one line at a time, and each caster's stats are yielded as soon as
+        the caster's entry is complete.
 
-        :return: a dictionary of dictionaries with format
-                 stats_list[caster] = {'spell_1': count_1}, ..., {'spell_n': count_n}
+        :param input_handle: an iterable of lines, e.g. a file object opened on GamParse output
+        :return: a generator of dictionaries with format {'name': caster, 'spell_1': count_1, ...}
         """
-        caster = 'unknown'
-        gp_header = re.compile(r'(?P<mob>(?:Combined: )?(?:[\w`,]+ ?)+) on (?P<date>\d{1,2}/\d{1,2}/\d{2,4})')
-        name_grabber = re.compile(r'\[B\](?P<name>\w+) - \d+\[/B\]')
+        # the reader is reused across files, so casters before the first main header must not inherit the last raid
+        self.mob = ''
+        self.date = ''
 
-        stats_list = []
-        lines = read_raw_parse(input_path)
-        for i, line in enumerate(lines):
-            if line.upper().startswith('[B]'):
-                caster = self.read_entry_header(gp_header, name_grabber, line)
-                if caster == 'unknown':
+        stats = None
+        lines = 0
+        for lines, line in enumerate(input_handle, 1):
+            line = line.rstrip('\r\n')
+            if stats is not None:
+                if self.add_spell_cast(stats, line):
                     continue
-                stats_list.append(self.get_caster_stats(caster, lines[i + 1:]))
+                yield stats
+                stats = None
 
-        return stats_list
+            if line.upper().startswith('[B]'):
+                caster = self.read_entry_header(GP_HEADER, NAME_GRABBER, line)
+                if caster != 'unknown':
+                    stats = {'name': caster}
 
-    def get_cast_table(self, input_path, blocklist):
-        """
-        Combine all player spellcast info with player data.
+        self.lines_read += lines
+        if stats is not None:
+            yield stats
 
-        :return: a data frame of spells X casters
+    def init_cast_data(self, input_path):
         """
-        spellcasts = self.init_cast_data(input_path)
-        return casttable.CastTable(spellcasts, self.player_data, blocklist)
-
-
-def read_raw_parse(path):
-    """
-    Read GamParse's forum output into a list.
+        Extract caster names and spellcast info from GamParse forum output.
 
-    :param path: path to a file containing GamParse output
-    :return: a list containing the lines of the input file
-    """
-    with open(path, 'r') as input_handle:
-        return input_handle.read().splitlines()
+        :return: a list of dictionaries with format
+                 stats_list[i] = {'name': caster, 'spell_1': count_1, ..., 'spell_n': count_n}
+        """
+        with open(input_path, 'r') as input_handle:
+            spellcasts = list(self.iter_cast_data(input_handle))
+            self.bytes_read += os.fstat(input_handle.fileno()).st_size
+            return spellcasts
@@ -1,6 +1,20 @@
+import collections
+import os
 import re
 
 import dpstable
+import gamparsecastreader as gpc
+
+# bump whenever a change to the reader alters the records it produces, invalidating cached parses
+READER_VERSION = 2
+
+GP_HEADER = re.compile(gpc.MOB_ON_DATE + r' in (?P<time>\d{1,5})sec')
+NAME_GRABBER = re.compile(r'\[B\](?P<name>\w+)\[/B\]')
+DPS_GRABBER = re.compile(
+    r'(?P<total>\d+) \@ (?P<sdps>\d+) sdps \((?P<dps>\d+) dps in (?P<time>\d+)s\) \[(?P<pct>\d+(\.\d+)?)%\]')
+DMG_BULLET = ' --- [B]DMG:[/B] '
+
+Fight = collections.namedtuple('Fight', ['mob', 'date', 'time'])
 
 
 class GPDPSReader:
@@ -20,6 +34,10 @@ class GPDPSReader:
         self.time = 0
         self.date = 'unknown'
 
+        # the amount of input read so far, for profiling
+        self.lines_read = 0
+        self.bytes_read = 0
+
     def get_info(self):
         """
         Retrieve a list of dps parse meta-information.
@@ -35,49 +53,55 @@ class GPDPSReader:
         :param gp_header: regex for parsing the main header of the dps output
         :param name_grabber: regex for parsing the entry headers of the dps output
         :param line: line of the dps output file to be parsed
-        :return: the name of the player doing the dps, if applicable, or 'unknown' if not applicable
+        :return: a tuple of the name of the player doing the dps, or 'unknown' if not applicable, and whether the line
+            is the main header of a new fight
         """
-        player = 'unknown'
         m = gp_header.match(line[3:-4])
-        n = name_grabber.match(line)
         if m:
             self.mob = m.group('mob')
             self.time = int(m.group('time'))
             self.date = m.group('date')
-        elif n:
+            return 'unknown', True
+        n = name_grabber.match(line)
+        if n:
             player = n.group('name')
             if not self.player_data.is_player(player) and player != 'Total':
                 print(f'Unrecognized player {player}. Did you forget to associate a pet with its owner?')
-                return 'unknown'
-        return player
+                return 'unknown', False
+            return player, False
+        return 'unknown', False
 
-    def init_dps(self, input_path):
+    def iter_fights(self, input_handle):
         """
-        Extract caster names and spell cast info from GamParse forum output.
+        Lazily split GamParse dps output into one batch of player stats per fight.
 
-        :return: a dictionary of dictionaries associating each dpser with his or her stats
+        The input is consumed in a single pass, and a fight's batch is yielded as soon as the next fight's main
+        header is read, so only one fight is held in memory at a time.
+
+        :param input_handle: an iterable of lines, e.g. a file object opened on GamParse output
+        :return: a generator of (Fight, [stats, ...]) tuples in the order the fights appear in the input
         """
+        # the reader is reused across files, so damage before the first main header must not inherit the last fight
+        self.mob = 'unknown'
+        self.time = 0
+        self.date = 'unknown'
         player = 'unknown'
-        gp_header = re.compile(
-            r'(?P<mob>(?:Combined: )?(?:[\w`,]+ ?)+) on (?P<date>\d{1,2}/\d{1,2}/\d{2,4}) in (?P<time>\d{1,5})sec')
-        name_grabber = re.compile(r'\[B\](?P<name>\w+)\[/B\]')
-        dps_grabber = re.compile(
-            r'(?P<total>\d+) \@ (?P<sdps>\d+) sdps \((?P<dps>\d+) dps in (?P<time>\d+)s\) \[(?P<pct>\d+(\.\d+)?)%\]')
-        dmg_bullet = ' --- [B]DMG:[/B] '
-
-        with open(input_path, 'r') as input_handle:
-            lines = input_handle.read().splitlines()
-
+        fight = Fight(self.mob, self.date, self.time)
         stats_list = []
-        for line in lines:
+        lines = 0
+        for lines, line in enumerate(input_handle, 1):
+            line = line.rstrip('\r\n')
             if line.upper().startswith('[B]'):
-                player = self.read_entry_header(gp_header, name_grabber, line)
-                if player == 'unknown' or player == 'Total':
-                    continue
-            elif line.startswith(dmg_bullet):
+                player, new_fight = self.read_entry_header(GP_HEADER, NAME_GRABBER, line)
+                if new_fight:
+                    if stats_list:
+                        yield fight, stats_list
+                    fight = Fight(self.mob, self.date, self.time)
+                    stats_list = []
+            elif line.startswith(DMG_BULLET):
                 if player == 'unknown' or player == 'Total':
                     continue
-                b = dps_grabber.match(line[len(dmg_bullet):])
+                b = DPS_GRABBER.match(line[len(DMG_BULLET):])
                 stats = {'name': player,
                          'total': b.group('total'),
                          'sdps': b.group('sdps'),
@@ -86,8 +110,44 @@ class GPDPSReader:
                          'pct': b.group('pct')}
                 stats_list.append(stats)
 
-        return stats_list
+        self.lines_read += lines
+        if stats_list:
+            yield fight, stats_list
+
+    def init_fights(self, input_path):
+        """
+        Extract the fights and the stats of each dpser in each fight from GamParse forum output.
+
+        :return: a list of (Fight, [stats, ...]) tuples in the order the fights appear in the input
+        """
+        return list(self._iter_file_fights(input_path))
+
+    def init_dps(self, input_path):
+        """
+        Extract caster names and spell cast info from GamParse forum output.
+
+        :return: a list of dictionaries associating each dpser with his or her stats
+        """
+        return [stats for _, stats_list in self._iter_file_fights(input_path) for stats in stats_list]
 
     def get_dps_table(self, input_path):
         dps = self.init_dps(input_path)
         return dpstable.DPSTable(dps, self.player_data)
+
+    def iter_dps_tables(self, input_path):
+        """
+        Lazily create one DPSTable per fight found in a GamParse dps output file.
+
+        Each table is only built when requested, so a whole night of fights can be processed with memory bounded by
+        the size of the largest fight.
+
+        :param input_path: path to a file containing GamParse output
+        :return: a generator of (Fight, DPSTable) tuples
+        """
+        for fight, stats_list in self._iter_file_fights(input_path):
+            yield fight, dpstable.DPSTable(stats_list, self.player_data)
+
+    def _iter_file_fights(self, input_path):
+        with open(input_path, 'r') as input_handle:
+            yield from self.iter_fights(input_handle)
+            self.bytes_read += os.fstat(input_handle.fileno()).st_size
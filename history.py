@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""Keeps a history of GamParse cast and dps parses in a SQLite database, and answers questions about it.
+
+Parses are appended once, and can then be queried by player, spell, class, mob, and date without reading the raw
+files again:
+
+    $ python3 history.py add raid1.txt raid2.txt
+    $ python3 history.py add --dps dps1.txt dps2.txt
+    $ python3 history.py casts --player Healzalot --spell 'Graceful Remedy' --last 12 --by date
+    $ python3 history.py dps --class ROG --since 2016-07-01
+"""
+
+import argparse
+import datetime
+import hashlib
+import sqlite3
+import sys
+import time
+
+import eqparsetables
+import gamparsecastreader as gpc
+import gamparsedpsreader as gpd
+import output
+
+# bump whenever the schema changes; a database written with another version has to be rebuilt
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS parses (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    source TEXT NOT NULL,
+    digest TEXT NOT NULL UNIQUE,
+    added REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS casts (
+    parse_id INTEGER NOT NULL REFERENCES parses(id),
+    date TEXT,
+    mob TEXT NOT NULL,
+    player TEXT NOT NULL,
+    class TEXT NOT NULL,
+    alias TEXT NOT NULL,
+    spell TEXT NOT NULL,
+    count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS damage (
+    parse_id INTEGER NOT NULL REFERENCES parses(id),
+    date TEXT,
+    mob TEXT NOT NULL,
+    fight_time INTEGER NOT NULL,
+    player TEXT NOT NULL,
+    class TEXT NOT NULL,
+    alias TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    active_time INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS casts_player ON casts(player);
+CREATE INDEX IF NOT EXISTS casts_spell ON casts(spell);
+CREATE INDEX IF NOT EXISTS casts_class ON casts(class);
+CREATE INDEX IF NOT EXISTS casts_mob ON casts(mob);
+CREATE INDEX IF NOT EXISTS casts_date ON casts(date);
+CREATE INDEX IF NOT EXISTS damage_player ON damage(player);
+CREATE INDEX IF NOT EXISTS damage_class ON damage(class);
+CREATE INDEX IF NOT EXISTS damage_mob ON damage(mob);
+CREATE INDEX IF NOT EXISTS damage_date ON damage(date);
+"""
+
+# the columns query results may be grouped by, shared by both tables
+GROUP_COLUMNS = ['date', 'mob', 'player', 'class', 'alias', 'spell']
+
+
+class History:
+    """
+    A SQLite database of the cast counts and damage read from GamParse parses.
+
+    Each record keeps the mob and date of its parse and the class and alias its player had when it was added, so
+    later config changes do not rewrite history. A file is only ever added once, however often it is passed in.
+    """
+
+    def __init__(self, path):
+        """
+        Open, or create, a history database.
+
+        :param path: path to the database file, or ':memory:'
+        """
+        self.connection = sqlite3.connect(path)
+        version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            self.connection.close()
+            raise ValueError(f'{path} has history schema version {version}, but {SCHEMA_VERSION} is needed. '
+                             f'Rebuild it by adding your parses to a new file.')
+
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+            self.connection.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def add_cast_file(self, path, reader):
+        """
+        Append the cast counts of a GamParse cast file, unless the file has been added before.
+
+        :param path: path to a file containing GamParse cast output
+        :param reader: a GPCastReader object
+        :return: the number of cast records added, or None if the file was already present
+        """
+        with open(path, 'r') as input_handle:
+            text = input_handle.read()
+
+        # the reader updates its mob and date as it passes each parse header, so read them as each caster arrives
+        records = ((reader.mob, reader.date, stats) for stats in reader.iter_cast_data(text.splitlines()))
+        return self.add_casts(records, reader.player_data, path, get_digest('cast', text))
+
+    def add_casts(self, records, player_data, source, digest):
+        """
+        Append cast records read by a GPCastReader.
+
+        :param records: an iterable of (mob, date, stats) tuples, where stats is a dictionary as yielded by
+                        GPCastReader.iter_cast_data
+        :param player_data: a PlayerData object
+        :param source: a description of where the records came from, e.g. a path
+        :param digest: a digest identifying the records, as returned by get_digest
+        :return: the number of cast records added, or None if records with this digest were already present
+        """
+        with self.connection:
+            parse_id = self._add_parse('cast', source, digest)
+            if parse_id is None:
+                return None
+
+            rows = []
+            for mob, date, stats in records:
+                player = stats['name']
+                if player == 'Total':
+                    continue
+                eq_class, alias = player_data.resolve([player])[0]
+                mob, date = get_mob(mob), to_iso_date(date)
+                rows += [(parse_id, date, mob, player, eq_class, alias, spell, count)
+                         for spell, count in stats.items() if spell != 'name']
+
+            self.connection.executemany('INSERT INTO casts VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        return len(rows)
+
+    def add_dps_file(self, path, reader):
+        """
+        Append the damage of every fight in a GamParse dps file, unless the file has been added before.
+
+        :param path: path to a file containing GamParse dps output
+        :param reader: a GPDPSReader object
+        :return: the number of damage records added, or None if the file was already present
+        """
+        with open(path, 'r') as input_handle:
+            text = input_handle.read()
+
+        fights = reader.iter_fights(text.splitlines())
+        return self.add_fights(fights, reader.player_data, path, get_digest('dps', text))
+
+    def add_fights(self, fights, player_data, source, digest):
+        """
+        Append fights read by a GPDPSReader.
+
+        :param fights: an iterable of (Fight, [stats, ...]) tuples, as yielded by GPDPSReader.iter_fights
+        :param player_data: a PlayerData object
+        :param source: a description of where the fights came from, e.g. a path
+        :param digest: a digest identifying the fights, as returned by get_digest
+        :return: the number of damage records added, or None if records with this digest were already present
+        """
+        with self.connection:
+            parse_id = self._add_parse('dps', source, digest)
+            if parse_id is None:
+                return None
+
+            rows = []
+            for fight, stats_list in fights:
+                mob, date = get_mob(fight.mob), to_iso_date(fight.date)
+                resolved = player_data.resolve(stats['name'] for stats in stats_list)
+                rows += [(parse_id, date, mob, fight.time, stats['name'], eq_class, alias, int(stats['total']),
+                          int(stats['time']))
+                         for stats, (eq_class, alias) in zip(stats_list, resolved)]
+
+            self.connection.executemany('INSERT INTO damage VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        return len(rows)
+
+    def get_raids(self, kind='cast', last=None):
+        """
+        List the raid dates present, most recent first.
+
+        :param kind: 'cast' or 'dps'
+        :param last: the number of most recent raids wanted, or None for all of them
+        :return: a list of ISO dates
+        """
+        table = get_table_name(kind)
+        query = f'SELECT DISTINCT date FROM {table} WHERE date IS NOT NULL ORDER BY date DESC'
+        if last is not None:
+            return [date for date, in self.connection.execute(query + ' LIMIT ?', (last,))]
+        return [date for date, in self.connection.execute(query)]
+
+    def query_casts(self, by=('player', 'spell'), **filters):
+        """
+        Total cast counts, grouped by some columns.
+
+        :param by: the columns to group by, from GROUP_COLUMNS
+        :param filters: any of player, spell, eq_class, mob, since, until, and last; see get_filter
+        :return: a tuple of the header, a list of column names, and the rows, a list of tuples ending with the
+                 summed count and ordered by the grouping columns
+        """
+        where, parameters = get_filter('casts', **filters)
+        columns = get_group_columns(by)
+        query = (f'SELECT {", ".join(columns)}, SUM(count) FROM casts {where} '
+                 f'GROUP BY {", ".join(columns)} ORDER BY {", ".join(columns)}')
+        return [*by, 'casts'], self.connection.execute(query, parameters).fetchall()
+
+    def query_dps(self, by=('player',), **filters):
+        """
+        Total damage, grouped by some columns, with the same sdps and dps measures as a combined DPSTable.
+
+        :param by: the columns to group by, from GROUP_COLUMNS except spell
+        :param filters: any of player, eq_class, mob, since, until, and last; see get_filter
+        :return: a tuple of the header, a list of column names, and the rows, a list of tuples ending with the
+                 number of fights, total damage, sdps, and dps, ordered by total damage
+        """
+        if 'spell' in by:
+            raise ValueError('dps cannot be grouped by spell')
+
+        where, parameters = get_filter('damage', **filters)
+        columns = get_group_columns(by)
+        query = (f'SELECT {", ".join(columns)}, COUNT(*), SUM(total), SUM(total) / MAX(SUM(fight_time), 1), '
+                 f'SUM(total) / MAX(SUM(active_time), 1) FROM damage {where} '
+                 f'GROUP BY {", ".join(columns)} ORDER BY SUM(total) DESC, {", ".join(columns)}')
+        return [*by, 'fights', 'total', 'sdps', 'dps'], self.connection.execute(query, parameters).fetchall()
+
+    def _add_parse(self, kind, source, digest):
+        try:
+            cursor = self.connection.execute('INSERT INTO parses (kind, source, digest, added) VALUES (?, ?, ?, ?)',
+                                             (kind, source, digest, time.time()))
+        except sqlite3.IntegrityError:
+            return None
+        return cursor.lastrowid
+
+
+def get_filter(table, player=None, spell=None, eq_class=None, mob=None, since=None, until=None, last=None):
+    """
+    Build the WHERE clause of a query.
+
+    Player, spell, and mob names match exactly, unless they contain the wildcards * or ?, which match as in shell
+    globs. Every condition can use an index.
+
+    :param table: 'casts' or 'damage'
+    :param player: a player name
+    :param spell: a spell name, without rank
+    :param eq_class: a class code, e.g. CLR
+    :param mob: a mob name
+    :param since: the earliest date included, e.g. 2016-07-01 or 7/1/2016
+    :param until: the latest date included
+    :param last: the number of most recent raid dates included
+    :return: a tuple of the clause, which may be empty, and its parameters
+    """
+    conditions = []
+    parameters = []
+    for column, value in (('player', player), ('spell', spell), ('mob', mob)):
+        if value is not None:
+            conditions.append(f'{column} GLOB ?' if any(c in value for c in '*?[') else f'{column} = ?')
+            parameters.append(value)
+    if eq_class is not None:
+        conditions.append('class = ?')
+        parameters.append(eq_class.upper())
+    if since is not None:
+        conditions.append('date >= ?')
+        parameters.append(to_iso_date(since))
+    if until is not None:
+        conditions.append('date <= ?')
+        parameters.append(to_iso_date(until))
+    if last is not None:
+        conditions.append(f'date IN (SELECT DISTINCT date FROM {table} WHERE date IS NOT NULL '
+                          f'ORDER BY date DESC LIMIT ?)')
+        parameters.append(last)
+
+    if not conditions:
+        return '', parameters
+    return 'WHERE ' + ' AND '.join(conditions), parameters
+
+
+def get_group_columns(by):
+    if not by:
+        raise ValueError(f'Group by at least one of {", ".join(GROUP_COLUMNS)}')
+    unknown = [column for column in by if column not in GROUP_COLUMNS]
+    if unknown:
+        raise ValueError(f'Cannot group by {", ".join(unknown)}; use {", ".join(GROUP_COLUMNS)}')
+    return list(by)
+
+
+def get_table_name(kind):
+    return {'cast': 'casts', 'dps': 'damage'}[kind]
+
+
+def get_digest(kind, text):
+    """
+    Identify a parse by its kind and content, so that adding the same file twice is noticed.
+
+    :param kind: 'cast' or 'dps'
+    :param text: the content of a GamParse file
+    :return: a hex digest
+    """
+    return hashlib.sha256(f'{kind}\n{text}'.encode()).hexdigest()
+
+
+def get_mob(mob):
+    return mob.strip().replace('Combined: ', '', 1) or 'unknown'
+
+
+def to_iso_date(date):
+    """
+    Convert a GamParse date, e.g. 7/26/2016 or 7/26/16, into an ISO date, which sorts and compares as text.
+
+    :param date: a date as month/day/year, or already in ISO format
+    :return: an ISO date string, or None if the date is unknown
+    """
+    if not date or date == 'unknown':
+        return None
+    if '/' not in date:
+        return datetime.date.fromisoformat(date).isoformat()
+
+    month, day, year = (int(part) for part in date.split('/'))
+    if year < 100:
+        year += 2000
+    return datetime.date(year, month, day).isoformat()
+
+
+def get_arg_parser():
+    parser = argparse.ArgumentParser(description='Keep and query a history of GamParse parses.')
+    parser.add_argument('-d', '--database', help='path to the history database (default history.db)',
+                        metavar='PATH', default='history.db')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    add = commands.add_parser('add', help='add GamParse cast, or dps, files to the history')
+    add.add_argument('paths', help='a list of paths containing GamParse output', nargs='+', metavar='PATHS')
+    add.add_argument('--dps', action='store_true', help='the files hold dps parses')
+    add.add_argument('-b', '--blocklist', help='path to blocklist', metavar='PATH')
+    add.add_argument('-c', '--config', help='path to config CSV file', metavar='PATH')
+
+    for name, description, groups, default in (('casts', 'total cast counts', GROUP_COLUMNS, 'player,spell'),
+                                               ('dps', 'total damage', GROUP_COLUMNS[:-1], 'player')):
+        query = commands.add_parser(name, help=f'show {description}')
+        query.add_argument('--player', help='player name; * and ? match as in shell globs')
+        if name == 'casts':
+            query.add_argument('--spell', help='spell name, without rank; * and ? match as in shell globs')
+        query.add_argument('--class', dest='eq_class', help='class code, e.g. CLR', metavar='CLASS')
+        query.add_argument('--mob', help='mob name; * and ? match as in shell globs')
+        query.add_argument('--since', help='earliest raid date, e.g. 2016-07-01 or 7/1/2016', metavar='DATE')
+        query.add_argument('--until', help='latest raid date', metavar='DATE')
+        query.add_argument('--last', help='only the most recent N raid dates', metavar='N', type=int)
+        query.add_argument('--by', help=f'comma separated columns to group by, from {", ".join(groups)} '
+                                        f'(default {default})', default=default)
+        query.add_argument('--tty', action='store_true', help='output text (default is enjin post format)')
+        query.add_argument('-o', '--out', action='append', type=output.parse_spec, metavar='FORMAT:PATH',
+                           help=f'write the table as one of {", ".join(sorted(output.formats))} to a file, '
+                                f'or - for stdout; may be repeated')
+
+    return parser
+
+
+def add_files(history, args):
+    player_data = eqparsetables.get_player_data(args)
+    if args.dps:
+        reader = gpd.GPDPSReader(player_data)
+        add = history.add_dps_file
+    else:
+        reader = gpc.GPCastReader(player_data, eqparsetables.get_blocklist(args))
+        add = history.add_cast_file
+
+    for path in args.paths:
+        eqparsetables.check_file(path)
+        added = add(path, reader)
+        if added is None:
+            print(f'{path} is already in the history', file=sys.stderr)
+        else:
+            print(f'Added {added} records from {path}', file=sys.stderr)
+
+
+def show_query(history, args):
+    filters = dict(player=args.player, eq_class=args.eq_class, mob=args.mob, since=args.since, until=args.until,
+                   last=args.last)
+    by = [column.strip() for column in args.by.split(',') if column.strip()]
+    if args.command == 'casts':
+        headers, rows = history.query_casts(by, spell=args.spell, **filters)
+        title = 'Casts'
+    else:
+        headers, rows = history.query_dps(by, **filters)
+        title = 'DPS'
+
+    # every table starts with a gutter column, which here numbers the rows
+    table = output.Table(title, [[''] + headers], [[str(i + 1), *map(str, row)] for i, row in enumerate(rows)],
+                         args.command == 'dps')
+    with output.Outputs(eqparsetables.get_output_specs(args)) as outputs:
+        outputs.write([table])
+
+
+def main(argv):
+    parser = get_arg_parser()
+    args = parser.parse_args(argv)
+
+    try:
+        with History(args.database) as history:
+            if args.command == 'add':
+                add_files(history, args)
+            else:
+                show_query(history, args)
+    except ValueError as e:
+        parser.error(str(e))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
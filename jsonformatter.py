@@ -0,0 +1,28 @@
+import json
+
+import format
+
+# the tables written to one sink form a single JSON array
+START = '[\n'
+SEPARATOR = ',\n'
+END = '\n]\n'
+
+
+def write_table(sink, title, headers, rows):
+    """
+    Write a table as a JSON object with 'title', 'headers', and 'rows' members to a file-like sink.
+
+    Cells are written as the same strings the other formats show, and rows are encoded a chunk at a time.
+
+    :param sink: a file-like object with a write method, e.g. sys.stdout
+    :param title: the table title
+    :param headers: a list of header rows
+    :param rows: a 2-D string array, or a list of lists, of rows
+    """
+    headers = [row for chunk in format.iter_chunks(headers) for row in chunk]
+    sink.write(f'{{"title": {json.dumps(title)}, "headers": {json.dumps(headers)}, "rows": [')
+    separator = ''
+    for chunk in format.iter_chunks(rows):
+        sink.write(separator + ', '.join(json.dumps(row) for row in chunk))
+        separator = ', '
+    sink.write(']}')
@@ -0,0 +1,161 @@
+import argparse
+import collections
+import sys
+
+import numpy as np
+
+import csvformatter
+import enjinformatter
+import format
+import jsonformatter
+import ttyformatter
+
+# The formats tables can be written in. A format is a module with a write_table(sink, title, headers, rows)
+# function, and optionally START, SEPARATOR, and END strings written before, between, and after its tables, and a
+# HUMANIZE flag asking for large numbers in dps tables to be abbreviated. Adding a format only takes a new entry here.
+formats = {
+    'csv': csvformatter,
+    'enjin': enjinformatter,
+    'json': jsonformatter,
+    'tty': ttyformatter
+}
+
+# where to write tables, and in which format; a path of '-' is stdout
+OutputSpec = collections.namedtuple('OutputSpec', ['format', 'path'])
+
+# a table as exported by a CastTable or DPSTable, with a flag saying whether its numbers may be humanized
+Table = collections.namedtuple('Table', ['title', 'headers', 'rows', 'humanize'])
+
+
+def parse_spec(spec):
+    """
+    Parse a FORMAT:PATH output argument.
+
+    :param spec: a string such as 'enjin:post.txt' or 'tty:-'
+    :return: an OutputSpec object
+    """
+    name, _, path = spec.partition(':')
+    if name not in formats or not path:
+        raise argparse.ArgumentTypeError(f'{spec} is not FORMAT:PATH with FORMAT one of {", ".join(sorted(formats))}')
+    return OutputSpec(name, path)
+
+
+class Sink:
+    """
+    One destination of formatted tables, which may be written to many times, e.g. once per fight.
+    """
+
+    def __init__(self, spec):
+        """
+        Construct a Sink object.
+
+        :param spec: an OutputSpec object
+        """
+        self.spec = spec
+        self.formatter = formats[spec.format]
+        self.handle = None
+        self.written = False
+
+    def is_stdout(self):
+        return self.spec.path == '-'
+
+    def open(self):
+        self.handle = sys.stdout if self.is_stdout() else open(self.spec.path, 'w', encoding='utf-8')
+
+    def write(self, tables):
+        """
+        Format tables, appending them to whatever this sink already holds.
+
+        :param tables: a list of Table objects
+        """
+        for table in tables:
+            rows = table.rows
+            if table.humanize and getattr(self.formatter, 'HUMANIZE', False):
+                rows = humanize_rows(rows)
+
+            self.handle.write(getattr(self.formatter, 'SEPARATOR' if self.written else 'START', ''))
+            self.written = True
+            self.formatter.write_table(self.handle, table.title, table.headers, rows)
+        self.handle.flush()
+
+    def close(self):
+        if self.handle is None:
+            return
+
+        if not self.written:
+            self.handle.write(getattr(self.formatter, 'START', ''))
+        self.handle.write(getattr(self.formatter, 'END', ''))
+        self.handle.flush()
+        if not self.is_stdout():
+            self.handle.close()
+        self.handle = None
+
+
+class Outputs:
+    """
+    Write the same tables to several sinks, each in its own format, formatting the file sinks concurrently.
+
+    Tables are exported once, as string arrays, and shared by every sink. Sinks writing to stdout are formatted in
+    the calling thread, so that their output stays in order with anything else printed:
+
+        with output.Outputs([OutputSpec('enjin', 'post.txt'), OutputSpec('tty', '-')]) as outputs:
+            outputs.write(tables)
+    """
+
+    def __init__(self, specs):
+        """
+        Construct an Outputs object.
+
+        :param specs: a list of OutputSpec objects
+        """
+        self.sinks = [Sink(spec) for spec in specs]
+        self._pool = None
+
+    def __enter__(self):
+        for sink in self.sinks:
+            sink.open()
+
+        files = [sink for sink in self.sinks if not sink.is_stdout()]
+        if files and len(self.sinks) > 1:
+            import concurrent.futures
+            self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=len(files))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        for sink in self.sinks:
+            sink.close()
+
+    def write(self, tables):
+        """
+        Write tables to every sink.
+
+        :param tables: an iterable of Table objects
+        """
+        tables = list(tables)
+        if self._pool is None:
+            for sink in self.sinks:
+                sink.write(tables)
+            return
+
+        futures = [self._pool.submit(sink.write, tables) for sink in self.sinks if not sink.is_stdout()]
+        for sink in self.sinks:
+            if sink.is_stdout():
+                sink.write(tables)
+        for future in futures:
+            future.result()
+
+
+def humanize_rows(rows):
+    """
+    Humanize the numbers of a 2-D string array, a column at a time.
+
+    :param rows: a 2-D string array
+    :return: a 2-D string array of the same shape
+    """
+    rows = np.asarray(rows, dtype=str)
+    if rows.size == 0:
+        return rows
+    return np.column_stack([format.humanize_array(column) for column in rows.T])
@@ -0,0 +1,137 @@
+import hashlib
+import os
+import pickle
+import time
+
+CACHE_SUFFIX = '.parse'
+
+
+class ParseCache:
+    """
+    An on-disk cache of parsed GamParse output, keyed by input file content and parse context.
+
+    Entries are pickled, so unchanged inputs skip parsing entirely. Entries are written atomically, so several
+    processes may share one cache directory.
+    """
+
+    def __init__(self, path, max_bytes=None, max_age=None):
+        """
+        Construct a ParseCache object.
+
+        :param path: the cache directory, which is created if necessary
+        :param max_bytes: the total size above which the least recently used entries are evicted, or None
+        :param max_age: the age in seconds after which unused entries are evicted, or None
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(path, exist_ok=True)
+
+    def get_key(self, input_path, context):
+        """
+        Compute the cache key of an input file.
+
+        :param input_path: path to a file containing GamParse output
+        :param context: a digest of everything besides the file content that affects parsing (see fingerprint)
+        :return: a hex digest naming the cache entry
+        """
+        digest = hashlib.sha256(context.encode())
+        with open(input_path, 'rb') as input_handle:
+            for chunk in iter(lambda: input_handle.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def load(self, key):
+        """
+        Retrieve a cache entry, marking it as recently used.
+
+        :param key: a key returned by get_key
+        :return: the cached value, or None if there is no usable entry
+        """
+        entry_path = self._get_entry_path(key)
+        try:
+            with open(entry_path, 'rb') as entry_handle:
+                value = pickle.load(entry_handle)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+        os.utime(entry_path)
+        return value
+
+    def store(self, key, value):
+        """
+        Write a cache entry.
+
+        :param key: a key returned by get_key
+        :param value: a picklable value
+        """
+        import tempfile
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.path)
+        try:
+            with os.fdopen(fd, 'wb') as entry_handle:
+                pickle.dump(value, entry_handle, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._get_entry_path(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def record(self, hit):
+        """
+        Count a cache lookup.
+
+        :param hit: True if the lookup was served from the cache
+        """
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def evict(self):
+        """
+        Remove entries that are too old, then the least recently used entries until the cache fits its size limit.
+
+        :return: the number of entries removed
+        """
+        entries = []
+        for name in os.listdir(self.path):
+            if name.endswith(CACHE_SUFFIX):
+                entry_path = os.path.join(self.path, name)
+                st = os.stat(entry_path)
+                entries.append((st.st_mtime, st.st_size, entry_path))
+        entries.sort()
+
+        now = time.time()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for mtime, size, entry_path in entries:
+            too_old = self.max_age is not None and now - mtime > self.max_age
+            too_big = self.max_bytes is not None and total > self.max_bytes
+            if not (too_old or too_big):
+                continue
+
+            os.unlink(entry_path)
+            total -= size
+            removed += 1
+
+        return removed
+
+    def get_summary(self):
+        return f'Parse cache: {self.hits} hits, {self.misses} misses'
+
+    def _get_entry_path(self, key):
+        return os.path.join(self.path, key + CACHE_SUFFIX)
+
+
+def fingerprint(*parts):
+    """
+    Summarize the parse context, e.g. reader version, roster, and blocklist, as a short digest.
+
+    :param parts: values with a stable repr
+    :return: a hex digest
+    """
+    return hashlib.sha256(repr(parts).encode()).hexdigest()
@@ -0,0 +1,161 @@
+import contextlib
+import io
+import sys
+
+import gamparsecastreader as gpc
+import gamparsedpsreader as gpd
+import parsecache
+import profiler
+
+# the reader and cache owned by each worker process, created once by the pool initializer
+_cast_reader = None
+_dps_reader = None
+_cache = None
+_context = None
+
+
+def _init_cast_reader(player_data, blocklist, cache, context):
+    global _cast_reader, _cache, _context
+    _cast_reader = gpc.GPCastReader(player_data, blocklist)
+    _cache = cache
+    _context = context
+
+
+def _read_cast_file(path):
+    return parse_file(_cast_reader, _cast_reader.init_cast_data, path, _cache, _context)
+
+
+def _init_dps_reader(player_data, cache, context):
+    global _dps_reader, _cache, _context
+    _dps_reader = gpd.GPDPSReader(player_data)
+    _cache = cache
+    _context = context
+
+
+def _read_dps_file(path):
+    return parse_file(_dps_reader, _dps_reader.init_fights, path, _cache, _context)
+
+
+def parse_file(reader, parse, path, cache=None, context=''):
+    """
+    Parse one GamParse file, consulting a parse cache if one is given.
+
+    Anything the parser prints is captured and handed back with the records, so that the caller can replay it in
+    input order. Cache entries store that output too, so a cache hit prints exactly what a fresh parse would.
+
+    :param reader: a GPCastReader or GPDPSReader object, which counts the input it reads
+    :param parse: a function: f(path) -> records, e.g. a method of 'reader'
+    :param path: path to a file containing GamParse output
+    :param cache: a ParseCache object, or None
+    :param context: a digest of everything besides the file content that affects parsing
+    :return: a tuple of the records, the parser's console output, whether the cache was hit, and the numbers of
+             lines and bytes parsed, which are zero on a cache hit
+    """
+    key = None
+    if cache is not None:
+        key = cache.get_key(path, context)
+        entry = cache.load(key)
+        if entry is not None:
+            records, output = entry
+            return records, output, True, (0, 0)
+
+    lines, size = reader.lines_read, reader.bytes_read
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        records = parse(path)
+    read = (reader.lines_read - lines, reader.bytes_read - size)
+
+    if cache is not None:
+        cache.store(key, (records, output.getvalue()))
+    return records, output.getvalue(), False, read
+
+
+def get_cast_context(player_data, blocklist):
+    """
+    Summarize everything besides the file content that affects the records GPCastReader produces.
+
+    :param player_data: a PlayerData object
+    :param blocklist: a Blocklist object of spells to be ignored
+    :return: a hex digest suitable as parse cache context
+    """
+    return parsecache.fingerprint('cast', gpc.READER_VERSION, player_data.rows, list(blocklist))
+
+
+def get_dps_context(player_data):
+    """
+    Summarize everything besides the file content that affects the records GPDPSReader produces.
+
+    :param player_data: a PlayerData object
+    :return: a hex digest suitable as parse cache context
+    """
+    return parsecache.fingerprint('dps fights', gpd.READER_VERSION, player_data.rows)
+
+
+def read_cast_files(paths, player_data, blocklist, jobs=1, cache=None):
+    """
+    Parse many GamParse cast files, optionally in a pool of worker processes.
+
+    Each worker returns the plain cast records of one file, which pickle compactly since repeated spell names are
+    interned. Results are yielded in the order of 'paths' whatever the number of jobs, so the output is identical
+    to a serial run.
+
+    :param paths: a list of paths to GamParse output
+    :param player_data: a PlayerData object
+    :param blocklist: a Blocklist object of spells to be ignored
+    :param jobs: the number of worker processes; 1 parses serially in this process
+    :param cache: a ParseCache object used to skip parsing unchanged files, or None
+    :return: a generator of cast record lists, one per path
+    """
+    context = get_cast_context(player_data, blocklist) if cache is not None else ''
+
+    if jobs <= 1 or len(paths) <= 1:
+        reader = gpc.GPCastReader(player_data, blocklist)
+        results = (parse_file(reader, reader.init_cast_data, path, cache, context) for path in paths)
+        yield from _replay(results, cache)
+        return
+
+    import concurrent.futures
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs,
+                                                initializer=_init_cast_reader,
+                                                initargs=(player_data, blocklist, cache, context)) as pool:
+        yield from _replay(pool.map(_read_cast_file, paths), cache)
+
+
+def read_dps_files(paths, player_data, jobs=1, cache=None):
+    """
+    Parse many GamParse dps files, optionally in a pool of worker processes.
+
+    Results are yielded in the order of 'paths' whatever the number of jobs, so the output is identical to a serial
+    run.
+
+    :param paths: a list of paths to GamParse output
+    :param player_data: a PlayerData object
+    :param jobs: the number of worker processes; 1 parses serially in this process
+    :param cache: a ParseCache object used to skip parsing unchanged files, or None
+    :return: a generator of lists of (Fight, [stats, ...]) tuples, one list per path
+    """
+    context = get_dps_context(player_data) if cache is not None else ''
+
+    if jobs <= 1 or len(paths) <= 1:
+        reader = gpd.GPDPSReader(player_data)
+        results = (parse_file(reader, reader.init_fights, path, cache, context) for path in paths)
+        yield from _replay(results, cache)
+        return
+
+    import concurrent.futures
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs,
+                                                initializer=_init_dps_reader,
+                                                initargs=(player_data, cache, context)) as pool:
+        yield from _replay(pool.map(_read_dps_file, paths), cache)
+
+
+def _replay(results, cache):
+    for records, output, hit, (lines, size) in results:
+        sys.stdout.write(output)
+        if cache is not None:
+            cache.record(hit)
+        profiler.count('input_lines', lines)
+        profiler.count('input_bytes', size)
+        yield records
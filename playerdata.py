@@ -1,4 +1,4 @@
-import pandas as pd
+import csv
 
 
 class PlayerData:
@@ -6,29 +6,57 @@ class PlayerData:
     PlayerData tracks the name, class, and alias of a list of players.
     """
 
+    headers = ['name', 'class', 'alias']
+    # positions of the attributes held in the (class, alias) tuples of the index, which is keyed by name
+    indexed = {'class': 0, 'alias': 1}
+
     def __init__(self, path):
         """
-        Read a player config file into a pandas data frame with columns name, class, alias.
+        Read a player config file and index its players by name.
 
-        The config file should be in CSV format with the values name, class, alias.
+        The config file should be in CSV format with the values name, class, alias. Whitespace around values is
+        ignored, a missing alias defaults to the player's name, and any other missing value becomes UNKNOWN.
 
         :param path: path to the config CSV file
-        :return: A data frame with columns name, class, alias
         """
-        headers = ['name', 'class', 'alias']
-        stripping_sep = ' *, *'
-        data = pd.read_csv(path, names=headers, sep=stripping_sep, engine='python')
+        rows = []
+        seen = set()
+        with open(path, 'r', newline='') as config_handle:
+            for record in csv.reader(config_handle):
+                values = [v.strip() or None for v in record[:len(self.headers)]]
+                values += [None] * (len(self.headers) - len(values))
+                name, eq_class, alias = values
+
+                # clean up - remove empty and duplicate rows, set missing aliases to name, all others to UNKNOWN
+                if (name, eq_class, alias) in seen or not any(values):
+                    continue
+                seen.add((name, eq_class, alias))
 
-        # clean up - remove NaN and duplicate rows, set NaN aliases to name, all other NaNs to UNKNOWN
-        data.drop_duplicates(inplace=True)
-        data.dropna(how='all', inplace=True)
-        data.loc[data['alias'].isnull(), 'alias'] = data.loc[data['alias'].isnull(), 'name']
-        data.fillna('UNKNOWN', inplace=True)
+                if alias is None:
+                    alias = name
+                rows.append([v if v is not None else 'UNKNOWN' for v in (name, eq_class, alias)])
 
-        self.data = data
+        # the first entry for a name wins, as with a scan of the config in file order
+        self.index = dict()
+        for name, eq_class, alias in rows:
+            self.index.setdefault(name, (eq_class, alias))
+
+        self.rows = rows
+        self.data = None
 
     def is_player(self, player):
-        return player in self.data['name'].unique()
+        return player in self.index
+
+    def resolve(self, names, default=('unknown', 'unknown')):
+        """
+        Look up the class and alias of many players at once.
+
+        :param names: an iterable of player names
+        :param default: the value used for names that are not in the config
+        :return: a list of (class, alias) tuples, one per name
+        """
+        index = self.index
+        return [index.get(name, default) for name in names]
 
     def get_data(self):
         """
@@ -36,14 +64,19 @@ class PlayerData:
 
         :return: a data frame containing the name, class, and alias of all players read in from file
         """
+        if self.data is None:
+            import pandas as pd
+
+            self.data = pd.DataFrame(self.rows, columns=self.headers)
         return self.data
 
     def _get_player_attribute(self, player, attribute):
+        if attribute not in self.indexed:
+            raise ValueError(f'Unknown player attribute {attribute}; expected one of {", ".join(self.indexed)}')
         if not self.is_player(player):
             return 'unknown'
 
-        player_idx = self.data.index[self.data['name'] == player].values[0]
-        return self.data.at[player_idx, attribute]
+        return self.index[player][self.indexed[attribute]]
 
     def get_player_class(self, player):
         return self._get_player_attribute(player, 'class')
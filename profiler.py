@@ -0,0 +1,171 @@
+import collections
+import contextlib
+import json
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# the profiler collecting measurements, if any; see Profiler.__enter__
+_active = None
+
+
+class Profiler:
+    """
+    Collect the time spent in each stage of a run, counts of the data processed, and peak memory use.
+
+    Code marks its stages with the module-level stage, iter_stage, and count functions, which do nothing unless a
+    Profiler is active:
+
+        with profiler.Profiler() as prof:
+            eqparsetables.handle_casts(...)
+        prof.write_report('profile.json')
+
+    Time spent in a stage nested inside another is counted in both.
+    """
+
+    def __init__(self, trace_memory=False):
+        """
+        Construct a Profiler object.
+
+        :param trace_memory: a flag indicating whether each stage's peak Python memory should be traced with
+                             tracemalloc, which slows the run down considerably
+        """
+        self.trace_memory = trace_memory
+        self.stages = collections.OrderedDict()
+        self.counts = collections.Counter()
+        self.seconds = 0.0
+
+        self._previous = None
+        self._start = None
+
+    def __enter__(self):
+        global _active
+        self._previous, _active = _active, self
+        if self.trace_memory:
+            tracemalloc.start()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        global _active
+        self.seconds += time.perf_counter() - self._start
+        if self.trace_memory:
+            tracemalloc.stop()
+        _active = self._previous
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Measure a stage, adding to any earlier measurements of the same name.
+
+        :param name: the stage name
+        """
+        stats = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0, 'peak_bytes': None})
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            base = tracemalloc.get_traced_memory()[0]
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stats['seconds'] += time.perf_counter() - start
+            stats['calls'] += 1
+            if tracing:
+                peak = tracemalloc.get_traced_memory()[1] - base
+                stats['peak_bytes'] = max(stats['peak_bytes'] or 0, peak)
+
+    def count(self, name, n=1):
+        self.counts[name] += n
+
+    def get_report(self):
+        """
+        Summarize the measurements.
+
+        :return: a dictionary suitable for JSON
+        """
+        return {
+            'seconds': self.seconds,
+            'stages': [dict(name=name, **stats) for name, stats in self.stages.items()],
+            'counts': dict(self.counts),
+            'peak_rss_bytes': get_peak_rss(),
+            'peak_rss_children_bytes': get_peak_rss(children=True),
+            'argv': sys.argv[1:]
+        }
+
+    def write_report(self, path):
+        with open(path, 'w') as report_handle:
+            json.dump(self.get_report(), report_handle, indent=2)
+            report_handle.write('\n')
+
+
+def stage(name):
+    """
+    Measure a stage of the active profiler, if any.
+
+    :param name: the stage name
+    :return: a context manager
+    """
+    if _active is None:
+        return contextlib.nullcontext()
+    return _active.stage(name)
+
+
+def iter_stage(name, iterable):
+    """
+    Measure the time taken to produce each item of an iterable, e.g. a generator reading files, as a stage.
+
+    :param name: the stage name
+    :param iterable: any iterable
+    :return: an iterator over the items of 'iterable'
+    """
+    if _active is None:
+        return iter(iterable)
+    return _iter_stage(_active, name, iter(iterable))
+
+
+def _iter_stage(prof, name, iterator):
+    while True:
+        with prof.stage(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def count(name, n=1):
+    """
+    Add to a count of the active profiler, if any, e.g. of records read.
+
+    :param name: the name of the count
+    :param n: the amount added
+    """
+    if _active is not None:
+        _active.count(name, n)
+
+
+def is_active():
+    return _active is not None
+
+
+def get_peak_rss(children=False):
+    """
+    Get the peak resident set size of this process, or of its finished child processes, e.g. parse workers.
+
+    :param children: a flag selecting child processes
+    :return: a size in bytes, or None where unsupported
+    """
+    if resource is None:
+        return None
+
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is in kilobytes on Linux, but in bytes on macOS
+    return usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
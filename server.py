@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""Serves EQParseTables over local HTTP, keeping the player config, blocklist, and spell maps loaded between requests.
+
+POST GamParse forum output to /casts or /dps and the response body is exactly what eqparsetables.py would print for
+that parse. Query parameters: format=csv|enjin|json|tty (default enjin), and for /dps first=N and last=N.
+
+    $ python3 server.py --port 8080 &
+    $ curl --data-binary @parse.txt 'http://127.0.0.1:8080/casts?format=tty'
+"""
+
+import argparse
+import contextlib
+import http.server
+import io
+import sys
+import threading
+import urllib.parse
+
+import casttable
+import dpstable
+import eqparsetables
+import gamparsecastreader as gpc
+import gamparsedpsreader as gpd
+import output
+
+
+class RequestOutput(io.TextIOBase):
+    """
+    A stand-in for sys.stdout which sends each thread's output to that thread's capture buffer, if it has one.
+
+    The readers and table printers report through print, and contextlib.redirect_stdout swaps sys.stdout for every
+    thread at once, so concurrent requests would otherwise see each other's output.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, s):
+        return (getattr(self.local, 'buffer', None) or self.stream).write(s)
+
+    def flush(self):
+        (getattr(self.local, 'buffer', None) or self.stream).flush()
+
+    @contextlib.contextmanager
+    def capture(self):
+        """
+        Collect everything the current thread prints.
+
+        :return: a context manager yielding the StringIO that receives the output
+        """
+        self.local.buffer = io.StringIO()
+        try:
+            yield self.local.buffer
+        finally:
+            self.local.buffer = None
+
+
+class ParseServer(http.server.ThreadingHTTPServer):
+    """
+    A threaded HTTP server holding the state shared by every request.
+
+    The player data and blocklist are read once, up front, and are only ever read afterwards; each request gets its
+    own reader and tables, so requests can be handled concurrently.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, player_data, blocklist, output):
+        """
+        Construct a ParseServer object.
+
+        :param address: a (host, port) tuple; port 0 picks a free port
+        :param player_data: a PlayerData object
+        :param blocklist: a Blocklist object of spells to be ignored
+        :param output: the RequestOutput installed as sys.stdout
+        """
+        super().__init__(address, ParseRequestHandler)
+        self.player_data = player_data
+        self.blocklist = blocklist
+        self.output = output
+
+
+class ParseRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Answer POST /casts and POST /dps with the tables for the parse in the request body.
+    """
+
+    def do_POST(self):
+        url = urllib.parse.urlsplit(self.path)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        handlers = {
+            '/casts': render_casts,
+            '/dps': render_dps
+        }
+
+        if url.path not in handlers:
+            self.send_text(404, f'Unknown path {url.path}; use /casts or /dps.\n')
+            return
+        if params.get('format', 'enjin') not in output.formats:
+            self.send_text(400, f'format must be one of {", ".join(sorted(output.formats))}.\n')
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        text = self.rfile.read(length).decode('utf-8', errors='replace')
+
+        try:
+            with self.server.output.capture() as captured:
+                handlers[url.path](self.server, text, params)
+        except ValueError as e:
+            self.send_text(400, f'{e}\n')
+            return
+        except Exception as e:
+            # a failed request must still be answered, rather than silently dropping the connection
+            self.log_error('%s failed: %r', self.path, e)
+            self.send_text(500, f'Could not make tables for this parse: {e!r}\n')
+            return
+
+        self.send_text(200, captured.getvalue())
+
+    def send_text(self, status, text):
+        body = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        sys.stderr.write(f'{self.address_string()} - {format % args}\n')
+
+
+def render_casts(server, text, params):
+    """
+    Print the class cast tables of one GamParse cast parse.
+
+    :param server: a ParseServer object
+    :param text: GamParse cast output
+    :param params: the request's query parameters
+    """
+    reader = gpc.GPCastReader(server.player_data, server.blocklist)
+    spellcasts = list(reader.iter_cast_data(text.splitlines()))
+    cast_table = casttable.SparseCastTable(spellcasts, server.player_data, server.blocklist)
+    with get_outputs(params) as outputs:
+        eqparsetables.write_class_tables(cast_table, cast_table.get_classes(), outputs)
+
+
+def render_dps(server, text, params):
+    """
+    Print the dps table of one GamParse dps parse, with the fights combined into one row per player.
+
+    :param server: a ParseServer object
+    :param text: GamParse dps output
+    :param params: the request's query parameters
+    """
+    bounds = argparse.Namespace(dpsfirst=params.get('first'), dpslast=params.get('last'))
+    dps_first, dps_last = eqparsetables.get_dps_bounds(bounds)
+
+    reader = gpd.GPDPSReader(server.player_data)
+    accumulator = dpstable.DPSAccumulator()
+    accumulator.add(reader.iter_fights(text.splitlines()))
+    if not accumulator.names:
+        raise ValueError('No dps by recognized players was found in the parse.')
+    with get_outputs(params) as outputs:
+        eqparsetables.write_dps_rankings('DPS', accumulator.get_table(server.player_data), dps_first, dps_last,
+                                         outputs)
+
+
+def get_outputs(params):
+    return output.Outputs([output.OutputSpec(params.get('format', 'enjin'), '-')])
+
+
+def make_server(address, player_data, blocklist):
+    """
+    Create a ParseServer, installing the per-thread stdout it needs.
+
+    :param address: a (host, port) tuple; port 0 picks a free port
+    :param player_data: a PlayerData object
+    :param blocklist: a Blocklist object of spells to be ignored
+    :return: a ParseServer object, ready to serve_forever
+    """
+    if not isinstance(sys.stdout, RequestOutput):
+        sys.stdout = RequestOutput(sys.stdout)
+    return ParseServer(address, player_data, blocklist, sys.stdout)
+
+
+def get_arg_parser():
+    parser = argparse.ArgumentParser(description='Serve EQParseTables over local HTTP.')
+    parser.add_argument('-b', '--blocklist', help='path to blocklist', metavar='PATH')
+    parser.add_argument('-c', '--config', help='path to config CSV file', metavar='PATH')
+    parser.add_argument('--host', help='address to listen on (default 127.0.0.1)', default='127.0.0.1')
+    parser.add_argument('--port', help='port to listen on (default 8080)', type=int, default=8080)
+    return parser
+
+
+def main(argv):
+    args = get_arg_parser().parse_args(argv)
+    server = make_server((args.host, args.port), eqparsetables.get_player_data(args),
+                         eqparsetables.get_blocklist(args))
+
+    host, port = server.server_address[:2]
+    print(f'Serving on http://{host}:{port}/casts and /dps. Press Ctrl+C to stop.', file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,179 @@
+import math
+from xml.sax.saxutils import escape, quoteattr
+
+# the palette of pygal's DarkStyle, so SVG charts look like their PNG counterparts
+background = 'black'
+plot_background = '#111'
+foreground = '#999'
+foreground_strong = '#eee'
+foreground_subtle = '#555'
+colors = ('#ff5995', '#b6e354', '#feed6c', '#8cedff', '#9e6ffe', '#899ca1', '#f8f8f2', '#bf4646', '#516083',
+          '#f92672', '#82b414', '#fd971f', '#56c2d6', '#808384', '#8c54fe', '#465457')
+
+width = 800
+height = 600
+title_font_size = 16
+label_font_size = 10
+legend_font_size = 14
+
+
+def write_chart(spec):
+    """
+    Write a chart described by a ChartSpec directly to an SVG file, without pygal or cairo.
+
+    :param spec: a ChartSpec object of kind 'stacked' or 'horizontal'
+    :return: void
+    """
+    writers = {
+        'stacked': iter_stacked_bar,
+        'horizontal': iter_horizontal_bar
+    }
+
+    with open(spec.path, 'w') as svg_handle:
+        for line in writers[spec.kind](spec):
+            svg_handle.write(line)
+            svg_handle.write('\n')
+
+
+def iter_stacked_bar(spec):
+    """
+    Generate the SVG text of a stacked bar chart, one element at a time.
+
+    :param spec: a ChartSpec object whose series are (title, [value per x label]) pairs
+    :return: a generator of lines of SVG
+    """
+    x_labels = spec.x_labels or []
+    value_font_size = spec.style.get('value_font_size', label_font_size)
+
+    legend_width = 170
+    left, top = 60, 50
+    right, bottom = width - legend_width, height - 60
+    plot_width, plot_height = right - left, bottom - top
+
+    totals = [0] * len(x_labels)
+    for _, values in spec.series:
+        totals = [t + (v or 0) for t, v in zip(totals, values)]
+    step, top_value = get_scale(max(totals, default=0))
+
+    def y(value):
+        return bottom - plot_height * value / top_value
+
+    yield from iter_header(spec)
+    yield from iter_y_axis(left, right, step, top_value, y)
+
+    band = plot_width / max(len(x_labels), 1)
+    bar_width = band * 0.7
+    for i, label in enumerate(x_labels):
+        x = left + band * (i + 0.5)
+        yield text(x, bottom + 20, label, foreground, label_font_size, anchor='middle')
+
+    bases = [0] * len(x_labels)
+    for n, (title, values) in enumerate(spec.series):
+        color = colors[n % len(colors)]
+        yield '<g class="series">'
+        for i, value in enumerate(values):
+            value = value or 0
+            if value <= 0 and not spec.options.get('print_zeroes', True):
+                continue
+            x = left + band * i + (band - bar_width) / 2
+            y_top, y_bottom = y(bases[i] + value), y(bases[i])
+            yield (f'<rect x="{x:.1f}" y="{y_top:.1f}" width="{bar_width:.1f}" height="{y_bottom - y_top:.1f}" '
+                   f'fill="{color}" fill-opacity="0.7" stroke="{color}"/>')
+            if spec.options.get('print_values') and y_bottom - y_top >= value_font_size:
+                yield text(x + bar_width / 2, (y_top + y_bottom + value_font_size) / 2 - 1, f'{int(value)}',
+                           foreground_strong, value_font_size, anchor='middle')
+            bases[i] += value
+        yield '</g>'
+
+        yield from iter_legend_entry(right + 20, top + n * (legend_font_size + 8), title, color)
+
+    yield '</svg>'
+
+
+def iter_horizontal_bar(spec):
+    """
+    Generate the SVG text of a horizontal bar chart, one element at a time.
+
+    :param spec: a ChartSpec object whose series are (title, [{'value': value, 'label': label}]) pairs
+    :return: a generator of lines of SVG
+    """
+    font_size = spec.style.get('label_font_size', label_font_size)
+
+    left, top = 20, 50
+    right, bottom = width - 20, height - 40
+    plot_width, plot_height = right - left, bottom - top
+
+    bars = [(title, points[0]['value'], points[0].get('label', title)) for title, points in spec.series]
+    step, top_value = get_scale(max((value for _, value, _ in bars), default=0))
+
+    yield from iter_header(spec)
+    yield f'<rect x="{left}" y="{top}" width="{plot_width}" height="{plot_height}" fill="{plot_background}"/>'
+    for i in range(int(round(top_value / step)) + 1):
+        x = left + plot_width * i * step / top_value
+        yield f'<line x1="{x:.1f}" y1="{top}" x2="{x:.1f}" y2="{bottom}" stroke="{foreground_subtle}"/>'
+        yield text(x, bottom + 16, format_tick(i * step), foreground, label_font_size, anchor='middle')
+
+    band = plot_height / max(len(bars), 1)
+    bar_height = band * 0.7
+    for n, (_, value, label) in enumerate(bars):
+        color = colors[n % len(colors)]
+        y = top + band * n + (band - bar_height) / 2
+        bar_width = plot_width * value / top_value
+        yield (f'<rect x="{left}" y="{y:.1f}" width="{bar_width:.1f}" height="{bar_height:.1f}" '
+               f'fill="{color}" fill-opacity="0.7" stroke="{color}"/>')
+        if spec.options.get('print_labels'):
+            yield text(left + 4, y + (bar_height + font_size) / 2 - 1, label, foreground_strong, font_size)
+
+    yield '</svg>'
+
+
+def iter_header(spec):
+    font_family = quoteattr(spec.style.get('font_family', 'sans-serif'))
+    yield (f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+           f'viewBox="0 0 {width} {height}" font-family={font_family}>')
+    yield f'<rect width="{width}" height="{height}" fill="{background}"/>'
+    if spec.title:
+        yield text(width / 2, 30, spec.title, foreground_strong, title_font_size, anchor='middle')
+
+
+def iter_y_axis(left, right, step, top_value, y):
+    bottom = y(0)
+    yield f'<rect x="{left}" y="{y(top_value):.1f}" width="{right - left}" height="{bottom - y(top_value):.1f}" ' \
+          f'fill="{plot_background}"/>'
+    for i in range(int(round(top_value / step)) + 1):
+        tick = i * step
+        yield f'<line x1="{left}" y1="{y(tick):.1f}" x2="{right}" y2="{y(tick):.1f}" stroke="{foreground_subtle}"/>'
+        yield text(left - 6, y(tick) + label_font_size / 2 - 1, format_tick(tick), foreground, label_font_size,
+                   anchor='end')
+
+
+def iter_legend_entry(x, y, title, color):
+    yield f'<rect x="{x}" y="{y}" width="{legend_font_size}" height="{legend_font_size}" fill="{color}"/>'
+    yield text(x + legend_font_size + 6, y + legend_font_size - 2, title, foreground, legend_font_size)
+
+
+def text(x, y, content, fill, font_size, anchor='start'):
+    return (f'<text x="{x:.1f}" y="{y:.1f}" fill="{fill}" font-size="{font_size}" text-anchor="{anchor}">'
+            f'{escape(str(content))}</text>')
+
+
+def get_scale(max_value):
+    """
+    Pick a whole axis step of 1, 2, or 5 times a power of ten giving at most ten ticks.
+
+    :param max_value: the largest value to be shown
+    :return: a tuple of the tick step and the top of the axis
+    """
+    if max_value <= 0:
+        return 1, 1
+
+    magnitude = 10 ** max(0, math.floor(math.log10(max_value / 10)))
+    for multiple in (1, 2, 5, 10):
+        step = multiple * magnitude
+        if max_value / step <= 10:
+            break
+    return step, step * math.ceil(max_value / step)
+
+
+def format_tick(value):
+    return f'{value:g}' if value < 1e6 else f'{value:.3g}'
@@ -1,12 +1,29 @@
-import pandas as pd
+import numpy as np
+
+import blocklist as bl
 
 
 class Table:
     def __init__(self, event_data, player_data):
+        import pandas as pd
+
         self.data = self._sanitize_table(pd.DataFrame(event_data), player_data)
 
+    @property
+    def data(self):
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        # replacing the data, e.g. when aggregating, invalidates every memoized view of it
+        self._data = data
+        self._classes = None
+        self._views = dict()
+
     def get_classes(self):
-        return self.data['class'].dropna().unique()
+        if self._classes is None:
+            self._classes = self.data['class'].dropna().unique()
+        return self._classes
 
     def is_class_included(self, eq_class):
         if eq_class is None:
@@ -21,23 +38,43 @@ class Table:
         if not self.is_class_included(eq_class):
             return []
 
-        table = self._get_table(eq_class)
-        row_names = list(table.index)
+        header, body = self.export_rows(eq_class)
+        return header.tolist(), body.tolist()
 
-        counts = []
-        for s in row_names:
-            counts.append([s] + [self._format_row_data(n) for n in list(table.loc[s])])
-        return [''] + table.columns.tolist(), counts
+    def export_rows(self, eq_class=None):
+        """
+        Export the table of one class as whole string arrays.
 
-    def _format_row_data(self, num):
-        return str(num)
+        Every cell is converted to a string in a single vectorized pass, so no Python-level work is done per cell.
 
-    def _get_table(self, eq_class=None):
-        if eq_class is None:
-            table = self.data
-        else:
-            table = self.data.loc[self.data['class'] == eq_class]
+        :param eq_class: the class of players to be included, or None for all players
+        :return: a tuple of the header, a 1-D string array starting with an empty gutter heading, and the body, a
+                 2-D string array whose first column holds the row names
+        """
+        if not self.is_class_included(eq_class):
+            return np.array([''], dtype=str), np.empty((0, 1), dtype=str)
 
+        table = self._get_table(eq_class)
+        header = np.concatenate([[''], np.asarray(table.columns, dtype=str)])
+        body = np.column_stack([np.asarray(table.index, dtype=str), to_strings(table.to_numpy())])
+        return header, body
+
+    def _get_table(self, eq_class=None):
+        """
+        Retrieve the table of one class, building the tables of all classes on first use.
+
+        :param eq_class: the class of players to be included, or None for all players
+        :return: a data frame produced by _make_table
+        """
+        if eq_class not in self._views:
+            if eq_class is None:
+                self._views[None] = self._make_table(self.data)
+            else:
+                for c, class_data in self.data.groupby('class', sort=False):
+                    self._views[c] = self._make_table(class_data)
+        return self._views[eq_class]
+
+    def _make_table(self, table):
         table = table.drop(['class', 'name'], axis='columns')
         cols = table.columns.tolist()
         cols.remove('alias')
@@ -49,16 +86,42 @@ class Table:
     def _get_drop_columns(self):
         return []
 
-    def _is_drop_column(self, col):
-        drop_cols = self._get_drop_columns()
-        for prefix in drop_cols:
-            if col.startswith(prefix):
-                return True
-        return False
+    def _is_drop_column(self, col, drop_cols=None):
+        if drop_cols is None:
+            drop_cols = bl.compile_prefixes(self._get_drop_columns())
+        return drop_cols.is_blocked(col)
 
     def _sanitize_table(self, df, player_data):
-        df = pd.merge(df, player_data.get_data(), how='left')
-        drop_cols = [col for col in df.columns if self._is_drop_column(col)]
+        if 'name' not in df.columns:
+            # a parse without any recognized players
+            df['name'] = []
+        classes_aliases = player_data.resolve(df['name'], default=(None, None))
+        df['class'] = [eq_class for eq_class, _ in classes_aliases]
+        df['alias'] = [alias for _, alias in classes_aliases]
+        drop_prefixes = bl.compile_prefixes(self._get_drop_columns())
+        drop_cols = [col for col in df.columns if self._is_drop_column(col, drop_prefixes)]
 
         df.drop(df[drop_cols], axis='columns', inplace=True)
         return df
+
+
+def to_strings(values):
+    """
+    Convert an array of cells to strings in one vectorized pass.
+
+    Integer arrays, such as cast counts, usually span a small range of values, so each distinct value is formatted
+    once and the cells are filled in by lookup, which is far cheaper than formatting every cell.
+
+    :param values: an array of cells
+    :return: a string array of the same shape
+    """
+    values = np.asarray(values)
+    if values.dtype.kind not in 'iu' or values.size == 0:
+        return values.astype(str)
+
+    low, high = int(values.min()), int(values.max())
+    if high - low > values.size:
+        return values.astype(str)
+
+    labels = np.array([str(n) for n in range(low, high + 1)])
+    return labels[values - low]
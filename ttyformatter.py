@@ -1,26 +1,57 @@
+import io
+
+import numpy as np
+
+import format
+
+# written between tables: three blank lines
+SEPARATOR = '\n\n\n'
+# large numbers in dps tables are abbreviated, e.g. 1.2m
+HUMANIZE = True
+
+
 def make_table(title, headers, rows):
-    gutter_width, cell_width = get_cell_widths(headers + rows)
+    table = io.StringIO()
+    write_table(table, title, headers, rows)
+    return table.getvalue()[:-1]
+
 
-    w = gutter_width + (len(rows[0]) - 1) * cell_width
-    header_fmt = f'{{:_^{w}}}\n'
-    str_list = [header_fmt.format(title)]
+def write_table(sink, title, headers, rows):
+    """
+    Write a table as fixed width text to a file-like sink, a chunk of rows at a time.
 
-    gutter_fmt = f'{{:>{gutter_width}}} '
-    cell_fmt = f'{{:{cell_width}}}'
+    :param sink: a file-like object with a write method, e.g. sys.stdout
+    :param title: the table title
+    :param headers: a list of header rows
+    :param rows: a 2-D string array, or a list of lists, of rows
+    """
+    header_cells = np.asarray(headers, dtype=str)
+    body_cells = np.asarray(rows, dtype=str).reshape(-1, header_cells.shape[1])
+    gutter_width, cell_width = get_cell_widths(header_cells, body_cells)
 
-    for r in headers + rows:
-        gutter = r[0]
-        if isinstance(r[0], int):
-            gutter = str(r[0] + 1)
-        str_list.append(gutter_fmt.format(gutter) + ''.join(cell_fmt.format(x) for x in r[1:]))
+    w = gutter_width + (header_cells.shape[1] - 1) * cell_width
+    sink.write(f'{title:_^{w}}\n\n')
+    for cells in (header_cells, body_cells):
+        for start in range(0, len(cells), format.CHUNK_ROWS):
+            chunk = cells[start:start + format.CHUNK_ROWS]
+            gutters = np.char.rjust(chunk[:, 0], gutter_width).tolist()
+            values = np.char.ljust(chunk[:, 1:], cell_width).tolist()
+            sink.write(''.join(f'{gutter} ' + ''.join(row) + '\n' for gutter, row in zip(gutters, values)))
 
-    return '\n'.join(str_list)
 
+def get_cell_widths(*tables):
+    """
+    Find the widths of the gutter and of the other cells from whole string arrays, a column at a time.
 
-def get_cell_widths(rows):
-    gutter = 0
-    cell = 15
-    for r in rows:
-        gutter = max(gutter, len(str(r[0])))
-        cell = max([cell] + [len(str(c)) for c in r[1:]])
+    :param tables: 2-D string arrays with the same number of columns
+    :return: a tuple of the gutter width and the cell width
+    """
+    gutter, cell = 0, 15
+    for cells in tables:
+        cells = np.asarray(cells, dtype=str)
+        if cells.size == 0:
+            continue
+        gutter = max(gutter, int(np.char.str_len(cells[:, 0]).max()))
+        for column in cells.T[1:]:
+            cell = max(cell, int(np.char.str_len(column).max()))
     return gutter, cell
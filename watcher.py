@@ -0,0 +1,94 @@
+import fnmatch
+import os
+import time
+
+
+class InputWatcher:
+    """
+    Poll GamParse output files and directories for new or appended content.
+
+    Each file is read from where the previous read left off, so only content added since then is returned. A file
+    is only read once its size and modification time have held steady for a whole poll, so that a dump which is
+    still being pasted or saved is not read half-written.
+    """
+
+    def __init__(self, paths, pattern='*.txt'):
+        """
+        Construct an InputWatcher object.
+
+        :param paths: a list of files and directories to watch
+        :param pattern: a glob pattern selecting the files to be watched within directories
+        """
+        self.paths = paths
+        self.pattern = pattern
+
+        self.offsets = dict()
+        self.observed = dict()
+
+    def get_files(self):
+        """
+        List the files currently being watched.
+
+        :return: a sorted list of file paths
+        """
+        files = []
+        for path in self.paths:
+            if os.path.isdir(path):
+                files.extend(os.path.join(path, name) for name in os.listdir(path)
+                             if fnmatch.fnmatch(name, self.pattern) and os.path.isfile(os.path.join(path, name)))
+            elif os.path.isfile(path):
+                files.append(path)
+        return sorted(files)
+
+    def poll(self):
+        """
+        Read the content added to each watched file since it was last read.
+
+        A file which has shrunk was presumably rewritten, so it is read again from the beginning.
+
+        :return: a list of (path, text) pairs, one per file with new settled content, where text holds whole lines
+        """
+        changes = []
+        for path in self.get_files():
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+
+            observed = (st.st_size, st.st_mtime_ns)
+            settled = self.observed.get(path) == observed
+            self.observed[path] = observed
+
+            offset = self.offsets.get(path, 0)
+            if st.st_size < offset:
+                offset = 0
+            if not settled or st.st_size == offset:
+                continue
+
+            text, offset = self._read_lines(path, offset)
+            self.offsets[path] = offset
+            if text:
+                changes.append((path, text))
+        return changes
+
+    def watch(self, interval=2.0):
+        """
+        Poll the watched files forever.
+
+        :param interval: the number of seconds between polls
+        :return: a generator of the non-empty results of poll
+        """
+        while True:
+            changes = self.poll()
+            if changes:
+                yield changes
+            time.sleep(interval)
+
+    def _read_lines(self, path, offset):
+        with open(path, 'rb') as input_handle:
+            input_handle.seek(offset)
+            data = input_handle.read()
+
+        # leave a trailing partial line for the next read
+        end = data.rfind(b'\n') + 1
+        return data[:end].decode('utf-8', errors='replace'), offset + end